@@ -4,5 +4,6 @@ Database layer for nutrition data management
 
 from .converters import convert_nutrition_data
 from .nutrition_db import NutritionDB
+from .storage import OrjsonStorage
 
-__all__ = ['convert_nutrition_data', 'NutritionDB']
\ No newline at end of file
+__all__ = ['convert_nutrition_data', 'NutritionDB', 'OrjsonStorage']
\ No newline at end of file
@@ -2,10 +2,46 @@
 Convert nutrition data from JSON to TinyDB format
 """
 
-import json
+import os
 from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+import orjson
 from tinydb import TinyDB
 
+from .storage import OrjsonStorage
+
+try:
+    import ijson
+except ImportError:  # optional 'convert' extra - without it the source file is parsed in one go
+    ijson = None
+
+# Table TinyDB stores documents in when no table name is given
+DEFAULT_TABLE = "_default"
+
+class ConversionError(Exception):
+    """Raised when the source nutrition data cannot be parsed"""
+
+def _iter_source_foods(input_file: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (food_id, food_doc) pairs from the source JSON object
+    
+    With ijson installed the file is parsed incrementally, one food at a time;
+    otherwise it is decoded in a single orjson call.
+    """
+    with open(input_file, 'rb') as f:
+        if ijson is not None:
+            try:
+                yield from ijson.kvitems(f, '', use_float=True)
+            except ijson.JSONError as e:
+                raise ConversionError(e)
+        else:
+            try:
+                nutrition_data = orjson.loads(f.read())
+            except orjson.JSONDecodeError as e:
+                raise ConversionError(e)
+            yield from nutrition_data.items()
+
 def convert_nutrition_data(
     input_path: str = "data/complete_nutrition_database.json",
     output_path: str = "data/nutrition.json"
@@ -13,6 +49,10 @@ def convert_nutrition_data(
     """
     Convert JSON nutrition data to TinyDB format
     
+    Foods are written straight to the TinyDB file as they are read instead of
+    being built up as a TinyDB table in memory first, so peak memory stays at
+    one copy of the source data (or one food, with ijson installed).
+    
     Args:
         input_path: Path to source JSON file (relative to project root)
         output_path: Path for TinyDB output file (relative to project root)
@@ -27,40 +67,35 @@ def convert_nutrition_data(
         print(f"Error: {input_file} not found")
         return False
     
-    print(f"Loading data from {input_file}")
-    try:
-        with open(input_file, 'r') as f:
-            nutrition_data = json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"Error reading JSON: {e}")
-        return False
-    
-    print(f"Found {len(nutrition_data)} foods")
-    
     # Create output directory if it doesn't exist
     output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    # Create TinyDB database
-    print(f"Creating TinyDB database: {output_file}")
-    db = TinyDB(output_file)
-    db.truncate()  # Clear any existing data
-    
-    # Convert and insert data
-    converted_foods = []
-    for food_id, food_data in nutrition_data.items():
-        # Create new document with metadata
-        food_doc = food_data.copy()
-        food_doc['food_id'] = food_id
-        food_doc['source'] = 'usda'
-        food_doc['confidence'] = 1.0
-        
-        converted_foods.append(food_doc)
-    
-    # Insert all foods
-    db.insert_multiple(converted_foods)
-    db.close()
+    # Write to a temporary file so a parse error never leaves a truncated database behind
+    print(f"Converting {input_file} to TinyDB database: {output_file}")
+    temp_file = output_file.with_name(output_file.name + ".tmp")
+    count = 0
+    try:
+        with open(temp_file, 'wb') as out:
+            out.write(b'{"' + DEFAULT_TABLE.encode() + b'":{')
+            for food_id, food_doc in _iter_source_foods(input_file):
+                # Add metadata in place - the source data is discarded after conversion
+                food_doc['food_id'] = food_id
+                food_doc['source'] = 'usda'
+                food_doc['confidence'] = 1.0
+                
+                # Same layout TinyDB writes: sequential string document ids from 1
+                count += 1
+                if count > 1:
+                    out.write(b',')
+                out.write(orjson.dumps(str(count)) + b':' + orjson.dumps(food_doc))
+            out.write(b'}}')
+    except ConversionError as e:
+        print(f"Error reading JSON: {e}")
+        temp_file.unlink(missing_ok=True)
+        return False
+    os.replace(temp_file, output_file)
     
-    print(f"Successfully converted {len(converted_foods)} foods to {output_file}")
+    print(f"Successfully converted {count} foods to {output_file}")
     
     # Print statistics
     _print_conversion_stats(output_file)
@@ -69,10 +104,12 @@ def convert_nutrition_data(
 
 def _print_conversion_stats(db_path: Path) -> None:
     """Print database statistics after conversion"""
-    db = TinyDB(db_path)
+    db = TinyDB(db_path, storage=OrjsonStorage)
     
-    total_foods = len(db.all())
-    foods_with_serving_sizes = len([f for f in db.all() if 'serving_sizes' in f])
+    # Read the table once and derive every statistic from it
+    all_foods = db.all()
+    total_foods = len(all_foods)
+    foods_with_serving_sizes = sum(1 for f in all_foods if 'serving_sizes' in f)
     
     print(f"\nDatabase Statistics:")
     print(f"  Total foods: {total_foods}")
@@ -80,8 +117,8 @@ def _print_conversion_stats(db_path: Path) -> None:
     print(f"  Foods without serving sizes: {total_foods - foods_with_serving_sizes}")
     
     # Show sample
-    if db.all():
-        sample = db.all()[0]
+    if all_foods:
+        sample = all_foods[0]
         print(f"\nSample food:")
         print(f"  Description: {sample.get('description', 'Unknown')}")
         print(f"  Food ID: {sample.get('food_id')}")
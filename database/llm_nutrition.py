@@ -2,7 +2,10 @@
 LLM-based nutrition data estimation for missing ingredients
 """
 
-from typing import Dict, Any, Optional
+import asyncio
+import io
+import time
+from typing import Dict, Any, List, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
@@ -16,6 +19,15 @@ sys.path.insert(0, project_root)
 
 from src.llm_config import get_chat_llm
 
+ESTIMATE_MAX_TOKENS = 512
+
+# OpenAI Batch API settings for offline bulk estimation
+BATCH_POLL_INTERVAL = 30.0  # seconds between status checks
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# LangChain message types -> OpenAI chat roles
+_OPENAI_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
 class NutritionProfile(BaseModel):
     """Complete nutrition profile for an ingredient"""
     # Macronutrients
@@ -53,6 +65,9 @@ class LLMNutritionEstimator:
         """Initialize LLM nutrition estimator"""
         self.parser = JsonOutputParser(pydantic_object=NutritionProfile)
         
+        # Everything static (instructions, examples, schema) lives in the system
+        # message so each request shares a byte-identical prefix that the API's
+        # automatic prompt caching can reuse; only the ingredient name varies
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a nutrition expert. Provide accurate nutrition data for food ingredients per 100 grams.
 
@@ -64,22 +79,30 @@ IMPORTANT:
 - Be conservative with estimates - better to underestimate than overestimate
 - For vitamins, many foods will have 0.0 values - this is normal
 
-Format instructions: {format_instructions}"""),
-            ("human", """Provide complete nutrition data for: {ingredient_name}
-
-Consider the typical preparation and form of this ingredient as used in cooking.
+Consider the typical preparation and form of each ingredient as used in cooking.
 
 Examples for context:
 - Fresh basil: High vitamin K, moderate vitamin C, low calories
 - Firm tofu: High protein, calcium (if made with calcium sulfate), low vitamins
 - Canned coconut milk: High fat, moderate calories, some minerals
 
-Ingredient: {ingredient_name}""")
+Format instructions: {format_instructions}"""),
+            ("human", """Provide complete nutrition data for: {ingredient_name}""")
         ])
         
+        # The schema and pipeline are static - build them once, not per estimate
+        self._format_instructions = self.parser.get_format_instructions()
+        self._chain = self.get_chain()
+        
     def get_chain(self):
         """Get LLM chain with shared ChatOpenAI instance"""
-        return self.prompt | get_chat_llm(temperature=0.1) | self.parser
+        # JSON mode guarantees a bare, well-formed object, so the parser never
+        # has to dig it out of fences or commentary; the profile is ~22 numbers
+        llm = get_chat_llm(temperature=0.1).bind(
+            response_format={"type": "json_object"},
+            max_tokens=ESTIMATE_MAX_TOKENS,
+        )
+        return self.prompt | llm | self.parser
     
     async def get_nutrition_estimate(self, ingredient_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -92,9 +115,9 @@ Ingredient: {ingredient_name}""")
             Dictionary with complete nutrition data or None if failed
         """
         try:
-            result = await self.get_chain().ainvoke({
+            result = await self._chain.ainvoke({
                 "ingredient_name": ingredient_name,
-                "format_instructions": self.parser.get_format_instructions()
+                "format_instructions": self._format_instructions
             })
             
             # Convert Pydantic model to dict if needed
@@ -106,6 +129,110 @@ Ingredient: {ingredient_name}""")
             print(f"Error getting nutrition estimate for {ingredient_name}: {e}")
             return None
     
+    async def get_nutrition_estimates_batch(self, ingredient_names: List[str], max_concurrency: int = 10) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get nutrition estimates for several ingredients concurrently
+        
+        Args:
+            ingredient_names: Names of the ingredients
+            max_concurrency: Maximum number of LLM requests in flight at once
+            
+        Returns:
+            Estimates in the same order as ingredient_names (None where estimation failed)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def estimate(ingredient_name: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.get_nutrition_estimate(ingredient_name)
+        
+        return await asyncio.gather(*(estimate(name) for name in ingredient_names))
+    
+    def get_nutrition_estimates_batch_api(self, ingredient_names: List[str],
+                                          poll_interval: float = BATCH_POLL_INTERVAL) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get nutrition estimates through the OpenAI Batch API
+        
+        Batches cost half as much as regular requests and use a separate rate
+        limit pool, but may take up to 24 hours, so this is meant for offline
+        jobs such as preloading the database rather than interactive use.
+        
+        Args:
+            ingredient_names: Names of the ingredients
+            poll_interval: Seconds to wait between batch status checks
+            
+        Returns:
+            Estimates in the same order as ingredient_names (None where estimation failed)
+        """
+        if not ingredient_names:
+            return []
+        
+        llm = get_chat_llm(temperature=0.1)
+        client = llm.root_client
+        
+        # One chat completion request per ingredient, same prompt and settings as the chain
+        lines = []
+        for i, ingredient_name in enumerate(ingredient_names):
+            messages = self.prompt.format_messages(
+                ingredient_name=ingredient_name,
+                format_instructions=self._format_instructions
+            )
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": llm.model_name,
+                    "temperature": llm.temperature,
+                    "max_tokens": ESTIMATE_MAX_TOKENS,
+                    "response_format": {"type": "json_object"},
+                    "messages": [{"role": _OPENAI_ROLES[m.type], "content": m.content} for m in messages]
+                }
+            }))
+        
+        try:
+            input_file = client.files.create(
+                file=("nutrition_estimates.jsonl", io.BytesIO("\n".join(lines).encode())),
+                purpose="batch"
+            )
+            batch = client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            while batch.status not in BATCH_TERMINAL_STATUSES:
+                time.sleep(poll_interval)
+                batch = client.batches.retrieve(batch.id)
+            
+            if batch.status != "completed":
+                print(f"Nutrition estimate batch {batch.id} ended with status '{batch.status}'")
+            if not batch.output_file_id:
+                return [None] * len(ingredient_names)
+            
+            output = client.files.content(batch.output_file_id).text
+        except Exception as e:
+            print(f"Error running nutrition estimate batch: {e}")
+            return [None] * len(ingredient_names)
+        
+        # Output lines are not guaranteed to be in input order - map them back by custom_id
+        estimates: List[Optional[Dict[str, Any]]] = [None] * len(ingredient_names)
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            index = int(result["custom_id"])
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                print(f"Error getting nutrition estimate for {ingredient_names[index]}: {result.get('error')}")
+                continue
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+                estimates[index] = self.parser.parse(content)
+            except Exception as e:
+                print(f"Error getting nutrition estimate for {ingredient_names[index]}: {e}")
+        
+        return estimates
+    
     def get_nutrition_estimate_sync(self, ingredient_name: str) -> Optional[Dict[str, Any]]:
         """
         Synchronous version of nutrition estimation
@@ -117,9 +244,9 @@ Ingredient: {ingredient_name}""")
             Dictionary with complete nutrition data or None if failed
         """
         try:
-            result = self.get_chain().invoke({
+            result = self._chain.invoke({
                 "ingredient_name": ingredient_name,
-                "format_instructions": self.parser.get_format_instructions()
+                "format_instructions": self._format_instructions
             })
             
             # Convert Pydantic model to dict if needed
@@ -2,11 +2,38 @@
 NutritionDB - Main interface for querying nutrition data
 """
 
+import bisect
+import re
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set, Tuple
 from tinydb import TinyDB, Query
+from tinydb.table import Document
 from utils.fuzzy_match import FuzzyMatcher
-from .llm_nutrition import LLMNutritionEstimator
+from .llm_nutrition import LLMNutritionEstimator, BATCH_POLL_INTERVAL
+from .storage import OrjsonStorage
+
+# Patterns used to turn food names into ids
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Maximum number of distinct find_ingredient lookups kept in the result cache
+FIND_CACHE_SIZE = 2048
+
+# Maximum number of foods passed to the fuzzy scorer after trigram pre-filtering
+FUZZY_CANDIDATE_LIMIT = 200
+
+def _copy_food(doc: Document) -> Document:
+    """Copy of a cached food document that callers are free to modify"""
+    return Document(doc, doc.doc_id)
+
+def _trigrams(text: str) -> Set[str]:
+    """Get the set of character trigrams in a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
 
 class NutritionDB:
     """
@@ -26,10 +53,36 @@ class NutritionDB:
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database not found: {db_path}")
         
-        self.db = TinyDB(self.db_path)
+        self.db = TinyDB(self.db_path, storage=OrjsonStorage)
         self.Food = Query()
         self.fuzzy_matcher = FuzzyMatcher(min_confidence=min_confidence)
         self.llm_estimator = LLMNutritionEstimator() if enable_llm else None
+        
+        # In-memory snapshot of the table so searches don't re-read every document
+        self._all_foods: List[Document] = []
+        self._lower_desc: List[str] = []
+        self._positions: Dict[int, int] = {}  # doc_id -> index in _all_foods
+        
+        # food_id -> TinyDB doc_id, so lookups by id don't scan the whole table
+        self._id_index: Dict[str, int] = {}
+        
+        # Lowercase description -> position of the first food with it
+        self._desc_index: Dict[str, int] = {}
+        
+        # Description trigram -> positions in _all_foods, used to pre-filter fuzzy matching
+        self._trigram_index: Dict[str, Set[int]] = {}
+        
+        # Secondary indexes for the attribute queries (positions in _all_foods)
+        self._source_index: Dict[str, List[int]] = {}
+        self._serving_size_positions: List[int] = []
+        self._protein_values: List[float] = []  # sorted ascending
+        self._protein_positions: List[int] = []  # parallel to _protein_values
+        
+        for doc in self.db.all():
+            self._index_food(doc)
+        
+        # Repeated ingredient lookups are common while planning; cleared whenever foods change
+        self._find_ingredient_cached = lru_cache(maxsize=FIND_CACHE_SIZE)(self._find_ingredient_uncached)
     
     def get_food_by_id(self, food_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -39,10 +92,10 @@ class NutritionDB:
             food_id: The food_id to search for
             
         Returns:
-            Food document or None if not found
+            Copy of the food document or None if not found
         """
-        result = self.db.search(self.Food.food_id == food_id)
-        return result[0] if result else None
+        doc_id = self._id_index.get(food_id)
+        return _copy_food(self._all_foods[self._positions[doc_id]]) if doc_id is not None else None
     
     def search_by_description(self, description: str) -> List[Dict[str, Any]]:
         """
@@ -54,12 +107,8 @@ class NutritionDB:
         Returns:
             List of matching food documents
         """
-        # Case-insensitive search
-        description_lower = description.lower()
-        results = self.db.search(
-            self.Food.description.test(lambda desc: description_lower in desc.lower())
-        )
-        return results
+        # Copies, so callers can't modify the in-memory table and its indexes
+        return [_copy_food(self._all_foods[position]) for position in self._search_positions(description)]
     
     def find_ingredient(self, ingredient_name: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
@@ -72,21 +121,27 @@ class NutritionDB:
         Returns:
             List of matching foods with match scores, sorted by confidence
         """
+        # Matching is case-insensitive, so case variants share a cache entry.
+        # Hand out copies so callers can't modify cached results.
+        matches = self._find_ingredient_cached(ingredient_name.lower(), max_results)
+        return [dict(match) for match in matches]
+    
+    def _find_ingredient_uncached(self, ingredient_name: str, max_results: int) -> Tuple[Dict[str, Any], ...]:
+        """Look up an ingredient without the result cache (see find_ingredient)"""
         # Try exact search first
-        exact_matches = self.search_by_description(ingredient_name)
-        if exact_matches:
-            # Add perfect match score to exact matches
-            for match in exact_matches:
-                match['match_score'] = 1.0
-            return exact_matches[:max_results]
-        
-        # Fall back to fuzzy matching on all foods
-        all_foods = self.db.all()
+        exact_positions = self._search_positions(ingredient_name)
+        if exact_positions:
+            # Add perfect match score to exact matches (copies keep the table cache clean)
+            return tuple(
+                {**self._all_foods[position], 'match_score': 1.0} for position in exact_positions[:max_results]
+            )
+        
+        # Fall back to fuzzy matching on the foods sharing the most trigrams
         fuzzy_matches = self.fuzzy_matcher.find_best_matches(
-            ingredient_name, all_foods, limit=max_results
+            ingredient_name, self._fuzzy_candidates(ingredient_name), limit=max_results
         )
         
-        return fuzzy_matches
+        return tuple(fuzzy_matches)
     
     def find_or_create_ingredient(self, ingredient_name: str, auto_add: bool = True) -> Optional[Dict[str, Any]]:
         """
@@ -100,22 +155,9 @@ class NutritionDB:
             Food document with nutrition data, or None if not found and auto_add=False
         """
         # First try to find in database
-        matches = self.find_ingredient(ingredient_name, max_results=1)
-        
-        if matches and matches[0].get('match_score', 0) >= 0.8:
-            # High confidence match found - but check if it's complete
-            match = matches[0]
-            
-            # Check if nutrition profile is complete (has key vitamins)
-            required_fields = ['vitamin_c_mg', 'vitamin_a_mcg', 'thiamin_mg', 'riboflavin_mg']
-            missing_key_fields = [field for field in required_fields if field not in match]
-            
-            # If it's missing key nutrition data and source is LLM estimate, get fresh data
-            if missing_key_fields and match.get('source') == 'llm_estimate':
-                print(f"Found incomplete nutrition data for '{ingredient_name}'. Getting complete LLM estimate...")
-                # Don't return the incomplete match, proceed to LLM estimation
-            else:
-                return match
+        match = self._find_complete_match(ingredient_name)
+        if match:
+            return match
         
         if not auto_add:
             return None
@@ -129,13 +171,162 @@ class NutritionDB:
         
         nutrition_data = self.llm_estimator.get_nutrition_estimate_sync(ingredient_name)
         
+        return self._add_llm_estimate(ingredient_name, nutrition_data)
+    
+    async def find_or_create_ingredients(self, ingredient_names: List[str], auto_add: bool = True) -> List[Optional[Dict[str, Any]]]:
+        """
+        Find several ingredients, creating all missing ones with concurrent LLM estimates
+        
+        Args:
+            ingredient_names: Names of ingredients to find
+            auto_add: Whether to automatically add missing ingredients using LLM
+            
+        Returns:
+            Food documents in the same order as ingredient_names (None where not found)
+        """
+        # Database lookups first - they are cheap
+        results = [self._find_complete_match(name) for name in ingredient_names]
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing or not auto_add:
+            return results
+        
+        if not self.llm_estimator:
+            print(f"{len(missing)} ingredients not found and LLM is disabled")
+            return results
+        
+        # Ask the LLM about all misses at once
+        missing_names = [ingredient_names[i] for i in missing]
+        print(f"{len(missing_names)} ingredients not found in database. Getting LLM estimates...")
+        
+        estimates = await self.llm_estimator.get_nutrition_estimates_batch(missing_names)
+        
+        for i, food in zip(missing, self._add_llm_estimates(missing_names, estimates)):
+            results[i] = food
+        
+        return results
+    
+    def preload_ingredients(self, ingredient_names: List[str], poll_interval: float = BATCH_POLL_INTERVAL) -> int:
+        """
+        Add every ingredient missing from the database using one OpenAI Batch API job
+        
+        Batch jobs are half the price of regular requests but can take hours,
+        so this is for offline preloading rather than recipe generation.
+        
+        Args:
+            ingredient_names: Names of ingredients to make sure are in the database
+            poll_interval: Seconds to wait between batch status checks
+            
+        Returns:
+            Number of foods added
+        """
+        missing = [name for name in dict.fromkeys(ingredient_names)
+                   if self._find_complete_match(name) is None]
+        if not missing:
+            return 0
+        
+        if not self.llm_estimator:
+            print(f"{len(missing)} ingredients not found and LLM is disabled")
+            return 0
+        
+        print(f"Submitting a batch of {len(missing)} LLM nutrition estimates...")
+        estimates = self.llm_estimator.get_nutrition_estimates_batch_api(missing, poll_interval)
+        added = self._add_llm_estimates(missing, estimates)
+        return sum(food is not None for food in added)
+    
+    def _add_llm_estimates(self, ingredient_names: List[str],
+                           estimates: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Validate several LLM nutrition estimates and add the usable ones in one insert
+        
+        Args:
+            ingredient_names: Names of the estimated ingredients
+            estimates: LLM nutrition estimates (None where the estimate failed)
+            
+        Returns:
+            Newly added food documents in the same order (None where the estimate was unusable)
+        """
+        foods: List[Optional[Dict[str, Any]]] = [None] * len(ingredient_names)
+        accepted = [(i, name, nutrition_data)
+                    for i, (name, nutrition_data) in enumerate(zip(ingredient_names, estimates))
+                    if self._is_usable_estimate(name, nutrition_data)]
+        if not accepted:
+            return foods
+        
+        food_ids = self.add_foods([(name, nutrition_data, "llm_estimate", 0.7)
+                                   for _, name, nutrition_data in accepted])
+        for (i, _, _), food_id in zip(accepted, food_ids):
+            foods[i] = self.get_food_by_id(food_id)
+        
+        return foods
+    
+    def _find_complete_match(self, ingredient_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a high-confidence database match with complete nutrition data
+        
+        Args:
+            ingredient_name: Name of ingredient to find
+            
+        Returns:
+            Matching food document, or None if the LLM should be asked instead
+        """
+        # A food with exactly this description is a perfect match - skip the search
+        position = self._desc_index.get(ingredient_name.lower())
+        if position is not None:
+            matches = [{**self._all_foods[position], 'match_score': 1.0}]
+        else:
+            matches = self.find_ingredient(ingredient_name, max_results=1)
+        
+        if matches and matches[0].get('match_score', 0) >= 0.8:
+            # High confidence match found - but check if it's complete
+            match = matches[0]
+            
+            # Check if nutrition profile is complete (has key vitamins)
+            required_fields = ['vitamin_c_mg', 'vitamin_a_mcg', 'thiamin_mg', 'riboflavin_mg']
+            missing_key_fields = [field for field in required_fields if field not in match]
+            
+            # If it's missing key nutrition data and source is LLM estimate, don't
+            # return the incomplete match - callers that auto-add proceed to LLM
+            # estimation and report it themselves
+            if not (missing_key_fields and match.get('source') == 'llm_estimate'):
+                return match
+        
+        return None
+    
+    def _is_usable_estimate(self, ingredient_name: str, nutrition_data: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check that an LLM nutrition estimate exists and passes validation
+        
+        Args:
+            ingredient_name: Name of the estimated ingredient
+            nutrition_data: LLM nutrition estimate (None if the estimate failed)
+            
+        Returns:
+            bool: True if the estimate can be added to the database
+        """
         if not nutrition_data:
             print(f"Failed to get LLM estimate for {ingredient_name}")
-            return None
+            return False
         
         # Validate the LLM data
         if not self.llm_estimator.validate_nutrition_data(nutrition_data):
             print(f"LLM nutrition data for {ingredient_name} failed validation")
+            return False
+        
+        return True
+    
+    def _add_llm_estimate(self, ingredient_name: str, nutrition_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Validate an LLM nutrition estimate and add it to the database
+        
+        Args:
+            ingredient_name: Name of the estimated ingredient
+            nutrition_data: LLM nutrition estimate (None if the estimate failed)
+            
+        Returns:
+            The newly added food document, or None if the estimate was unusable
+        """
+        if not self._is_usable_estimate(ingredient_name, nutrition_data):
             return None
         
         # Add to database
@@ -166,12 +357,58 @@ class NutritionDB:
         Returns:
             str: The food_id of the added food
         """
-        # Generate unique food_id
-        food_id = self._generate_food_id(food_name)
+        food_doc = self._build_food_doc(food_name, nutrition_data, source, confidence)
+        
+        # Insert into database
+        doc_id = self.db.insert(food_doc)
+        self._index_food(Document(food_doc, doc_id))
+        self._find_ingredient_cached.cache_clear()
+        
+        return food_doc['food_id']
+    
+    def add_foods(self, items: List[Tuple[str, Dict[str, Any], str, float]]) -> List[str]:
+        """
+        Add several foods to the database with a single write
         
+        Args:
+            items: (food_name, nutrition_data, source, confidence) tuples
+            
+        Returns:
+            List[str]: The food_ids of the added foods, in input order
+        """
+        food_docs = [self._build_food_doc(food_name, nutrition_data, source, confidence)
+                     for food_name, nutrition_data, source, confidence in items]
+        if not food_docs:
+            return []
+        
+        # One insert_multiple rewrites the database file once instead of once per food
+        doc_ids = self.db.insert_multiple(food_docs)
+        for food_doc, doc_id in zip(food_docs, doc_ids):
+            self._index_food(Document(food_doc, doc_id))
+        self._find_ingredient_cached.cache_clear()
+        
+        return [food_doc['food_id'] for food_doc in food_docs]
+    
+    def _build_food_doc(self,
+                        food_name: str,
+                        nutrition_data: Dict[str, Any],
+                        source: str,
+                        confidence: float) -> Dict[str, Any]:
+        """
+        Build the document stored for a new food
+        
+        Args:
+            food_name: Name/description of the food
+            nutrition_data: Dictionary containing nutrition information
+            source: Data source ('llm_estimate', 'user_added', etc.)
+            confidence: Confidence score for the data (0.0-1.0)
+            
+        Returns:
+            Food document with a freshly generated food_id
+        """
         # Create food document
         food_doc = {
-            'food_id': food_id,
+            'food_id': self._generate_food_id(food_name),
             'description': food_name,
             'source': source,
             'confidence': confidence,
@@ -182,10 +419,7 @@ class NutritionDB:
         # Add nutrition data
         food_doc.update(nutrition_data)
         
-        # Insert into database
-        self.db.insert(food_doc)
-        
-        return food_id
+        return food_doc
     
     def update_food_usage(self, food_id: str) -> bool:
         """
@@ -203,7 +437,9 @@ class NutritionDB:
         
         # Update usage count
         current_usage = food.get('usage_count', 0)
-        self.db.update({'usage_count': current_usage + 1}, self.Food.food_id == food_id)
+        self.db.update({'usage_count': current_usage + 1}, doc_ids=[food.doc_id])
+        self._all_foods[self._positions[food.doc_id]]['usage_count'] = current_usage + 1
+        self._find_ingredient_cached.cache_clear()
         
         return True
     
@@ -214,7 +450,7 @@ class NutritionDB:
         Returns:
             List of foods with serving_sizes field
         """
-        return self.db.search(self.Food.serving_sizes.exists())
+        return [_copy_food(self._all_foods[position]) for position in self._serving_size_positions]
     
     def get_high_protein_foods(self, min_protein: float = 20.0) -> List[Dict[str, Any]]:
         """
@@ -226,9 +462,9 @@ class NutritionDB:
         Returns:
             List of high-protein foods
         """
-        return self.db.search(
-            (self.Food.protein.exists()) & (self.Food.protein >= min_protein)
-        )
+        # Binary search the protein-sorted index, then return foods in table order
+        start = bisect.bisect_left(self._protein_values, min_protein)
+        return [_copy_food(self._all_foods[position]) for position in sorted(self._protein_positions[start:])]
     
     def get_foods_by_source(self, source: str) -> List[Dict[str, Any]]:
         """
@@ -240,11 +476,11 @@ class NutritionDB:
         Returns:
             List of foods from specified source
         """
-        return self.db.search(self.Food.source == source)
+        return [_copy_food(self._all_foods[position]) for position in self._source_index.get(source, [])]
     
     def count_foods(self) -> int:
         """Get total number of foods in database"""
-        return len(self.db.all())
+        return len(self._all_foods)
     
     def get_database_stats(self) -> Dict[str, Any]:
         """
@@ -253,18 +489,23 @@ class NutritionDB:
         Returns:
             Dictionary with database statistics
         """
-        all_foods = self.db.all()
+        # One pass over the cached foods instead of a throw-away list per field
+        with_protein = with_fat = with_carbs = 0
+        for food in self._all_foods:
+            with_protein += 'protein' in food
+            with_fat += 'fat' in food
+            with_carbs += 'carbs' in food
         
         return {
-            'total_foods': len(all_foods),
-            'foods_with_serving_sizes': len([f for f in all_foods if 'serving_sizes' in f]),
+            'total_foods': len(self._all_foods),
+            'foods_with_serving_sizes': len(self._serving_size_positions),
             'foods_by_source': {
-                'usda': len(self.get_foods_by_source('usda')),
-                'llm_estimate': len(self.get_foods_by_source('llm_estimate')),
+                'usda': len(self._source_index.get('usda', ())),
+                'llm_estimate': len(self._source_index.get('llm_estimate', ())),
             },
-            'foods_with_protein_data': len([f for f in all_foods if 'protein' in f]),
-            'foods_with_fat_data': len([f for f in all_foods if 'fat' in f]),
-            'foods_with_carb_data': len([f for f in all_foods if 'carbs' in f]),
+            'foods_with_protein_data': with_protein,
+            'foods_with_fat_data': with_fat,
+            'foods_with_carb_data': with_carbs,
         }
     
     def close(self):
@@ -279,6 +520,57 @@ class NutritionDB:
         """Context manager exit"""
         self.close()
     
+    def _index_food(self, doc: Document) -> None:
+        """Add a stored document to the in-memory caches and indexes"""
+        position = len(self._all_foods)
+        description_lower = doc.get('description', '').lower()
+        
+        self._positions[doc.doc_id] = position
+        self._all_foods.append(doc)
+        self._lower_desc.append(description_lower)
+        if 'food_id' in doc:
+            self._id_index[doc['food_id']] = doc.doc_id
+        self._desc_index.setdefault(description_lower, position)
+        for trigram in _trigrams(description_lower):
+            self._trigram_index.setdefault(trigram, set()).add(position)
+        
+        if 'source' in doc:
+            self._source_index.setdefault(doc['source'], []).append(position)
+        if 'serving_sizes' in doc:
+            self._serving_size_positions.append(position)
+        protein = doc.get('protein')
+        if isinstance(protein, (int, float)):
+            i = bisect.bisect_right(self._protein_values, protein)
+            self._protein_values.insert(i, protein)
+            self._protein_positions.insert(i, position)
+    
+    def _search_positions(self, description: str) -> List[int]:
+        """Positions in _all_foods whose description contains the text, case-insensitively"""
+        # Case-insensitive search over precomputed lowercase descriptions
+        description_lower = description.lower()
+        return [position for position, desc in enumerate(self._lower_desc) if description_lower in desc]
+    
+    def _fuzzy_candidates(self, ingredient_name: str) -> List[Dict[str, Any]]:
+        """
+        Get the foods worth fuzzy scoring for an ingredient name
+        
+        Args:
+            ingredient_name: Name of ingredient to find
+            
+        Returns:
+            Up to FUZZY_CANDIDATE_LIMIT foods with the highest trigram overlap, in table order
+        """
+        query_trigrams = _trigrams(ingredient_name.lower())
+        if not query_trigrams:
+            return self._all_foods
+        
+        overlap = Counter()
+        for trigram in query_trigrams:
+            overlap.update(self._trigram_index.get(trigram, ()))
+        
+        positions = sorted(position for position, _ in overlap.most_common(FUZZY_CANDIDATE_LIMIT))
+        return [self._all_foods[position] for position in positions]
+    
     def _generate_food_id(self, food_name: str) -> str:
         """
         Generate unique food_id from food name
@@ -289,23 +581,16 @@ class NutritionDB:
         Returns:
             str: Unique food_id
         """
-        import re
-        from datetime import datetime
-        
         # Clean the name for ID generation
-        clean_name = re.sub(r'[^\w\s]', '', food_name.lower())
-        clean_name = re.sub(r'\s+', '_', clean_name.strip())
+        clean_name = _WHITESPACE_RE.sub('_', _PUNCT_RE.sub('', food_name.lower()).strip())
         
         # Truncate if too long
-        if len(clean_name) > 30:
-            clean_name = clean_name[:30]
-        
-        # Add timestamp to ensure uniqueness
-        timestamp = datetime.now().strftime("%y%m%d_%H%M")
+        clean_name = clean_name[:30]
         
-        return f"{clean_name}_{timestamp}"
+        # Random suffix keeps ids unique across instances and processes, even when
+        # the same food is added within the same second
+        return f"{clean_name}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
     
     def _get_current_date(self) -> str:
         """Get current date string"""
-        from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d")
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+TinyDB storage backed by orjson
+"""
+
+import io
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from tinydb.storages import JSONStorage
+
+class OrjsonStorage(JSONStorage):
+    """
+    JSONStorage that reads and writes the database file with orjson
+
+    The file format is unchanged, so databases written by the stock
+    JSONStorage (e.g. data/nutrition.json) load as-is.
+    """
+
+    def __init__(self, path: str, create_dirs: bool = False, encoding: Optional[str] = 'utf-8',
+                 access_mode: str = 'r+', **kwargs):
+        """
+        Initialize storage
+
+        Args:
+            path: Path to the database file
+            create_dirs: Whether to create missing parent directories
+            encoding: File encoding (orjson always emits UTF-8)
+            access_mode: Mode the file is opened in ('r' or 'r+')
+        """
+        super().__init__(path, create_dirs=create_dirs, encoding=encoding,
+                         access_mode=access_mode, **kwargs)
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Read the whole database file"""
+        self._handle.seek(0)
+        content = self._handle.read()
+
+        # Empty file - let TinyDB initialize the database
+        if not content:
+            return None
+
+        return orjson.loads(content)
+
+    def write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the database file contents with data"""
+        self._handle.seek(0)
+
+        try:
+            self._handle.write(orjson.dumps(data).decode())
+        except io.UnsupportedOperation:
+            raise IOError(f'Cannot write to the database. Access mode is "{self._mode}"')
+
+        # Ensure the file has been written, then drop any leftover tail
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.truncate()
@@ -1,12 +1,25 @@
-import json
 import argparse
 import asyncio
-from src.models import UserNeeds
-from src.planner import generate_plan
-from src.chef import generate_recipe, generate_nutrition_aware_recipe
+import sys
+from typing import List, Optional, Tuple
+
+import orjson
+from src.models import UserNeeds, Plan, Recipe, NutritionProfile
+from src.planner import generate_plan_async
+from src.chef import generate_recipe_async, generate_nutrition_aware_recipe_async
 from src.nutrition import compute_nutrition
-from src.ingredient_planner import generate_ingredient_plan
-from src.mcp_tools import MCPClientManager
+from src.ingredient_planner import generate_ingredient_plan_async
+from src.mcp_manager import MCPClientManager
+
+# Unit formatters for nutrition output; micronutrients are mg unless listed here
+KCAL = "{} kcal".format
+GRAMS = "{} g".format
+MG = "{} mg".format
+MCG = "{} mcg".format
+MICRO_UNITS = {k: MCG for k in ("vitamin_a_mcg", "vitamin_d_mcg", "vitamin_k_mcg", "folate_mcg", "vitamin_b12_mcg")}
+
+# Maximum number of batch requests generated at once
+BATCH_CONCURRENCY = 4
 
 
 def main():
@@ -39,101 +52,128 @@ def main():
         help="Nutrition optimization goals (e.g., 'high protein', 'low carb', 'balanced')"
     )
     
+    parser.add_argument(
+        "--batch",
+        help="JSONL file of requests to run against one MCP server; each line holds the options above "
+             "(e.g. {\"mode\": \"cuisine\", \"cuisine\": \"Thai\", \"max_prep_time\": 30}), "
+             "with missing ones taken from the command line"
+    )
+    
     args = parser.parse_args()
     
+    if args.batch:
+        runs = load_batch(args.batch, args)
+        for number, run_args in enumerate(runs, start=1):
+            error = validate_args(run_args)
+            if error:
+                parser.error(f"Batch request {number}: {error}")
+    else:
+        error = validate_args(args)
+        if error:
+            parser.error(error)
+        runs = [args]
+    
+    if asyncio.run(run_all(runs)):
+        sys.exit(1)
+
+
+def validate_args(args) -> Optional[str]:
+    """Return an error message if the options for args.mode are missing"""
     if args.mode == "cuisine":
         if not args.cuisine or not args.max_prep_time:
-            parser.error("Cuisine mode requires --cuisine and --max-prep-time")
+            return "Cuisine mode requires --cuisine and --max-prep-time"
     elif args.mode == "ingredient":
         if not args.request:
-            parser.error("Ingredient mode requires --request")
+            return "Ingredient mode requires --request"
+    else:
+        return f"Unknown mode: {args.mode}"
+    return None
 
 
-    if args.mode == "cuisine":
-        asyncio.run(run_cuisine_mode(args))
+def load_batch(path: str, defaults: argparse.Namespace) -> List[argparse.Namespace]:
+    """Read one request per JSONL line, filling unset options from defaults"""
+    runs = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                runs.append(argparse.Namespace(**{**vars(defaults), **orjson.loads(line)}))
+    return runs
+
+
+async def run_all(runs: List[argparse.Namespace]) -> int:
+    """
+    Run every request while sharing one warm MCP server and nutrition database
+    
+    Args:
+        runs: Parsed options for each request
         
-    elif args.mode == "ingredient":
-        asyncio.run(run_ingredient_mode(args))
+    Returns:
+        Number of requests that failed; their errors are reported on stderr
+    """
+    # Requests spend nearly all their time waiting on the LLM, so overlap them
+    # (bounded, to stay clear of rate limits) and print results in input order
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run(run_args):
+        async with semaphore:
+            if run_args.mode == "cuisine":
+                return await run_cuisine_mode(run_args)
+            return await run_ingredient_mode(run_args)
+    
+    async with MCPClientManager.session():
+        # One failed request shouldn't discard the others' results
+        results = await asyncio.gather(*(run(run_args) for run_args in runs), return_exceptions=True)
+    
+    failures = 0
+    for number, result in enumerate(results, start=1):
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"Request {number} failed: {result}", file=sys.stderr)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            print_output(*result)
+    return failures
+
+
+def print_output(plan, recipe, nutrition):
+    """Print the plan, recipe and nutrition (with units) as JSON"""
+    formatted_nutrition = {
+        "calories": KCAL(nutrition.calories),
+        "macros": {k: GRAMS(v) for k, v in nutrition.macros.items()},
+        "micros": {k: MICRO_UNITS.get(k, MG)(v) for k, v in nutrition.micros.items()},
+    }
+
+    output = {
+        "plan": plan.model_dump(),
+        "recipe": recipe.model_dump(),
+        "nutrition": formatted_nutrition,
+    }
+    print(orjson.dumps(output, option=orjson.OPT_INDENT_2).decode())
 
 
-async def run_cuisine_mode(args):
+async def run_cuisine_mode(args) -> Tuple[Plan, Recipe, NutritionProfile]:
     """Run traditional cuisine-based recipe generation"""
-    try:
-        await MCPClientManager.start_server()
-        
-        try:
-            constraints = UserNeeds(
-                cuisine=args.cuisine,
-                max_prep_time=args.max_prep_time,
-                dietary_needs=args.dietary_needs
-            )
-            plan = generate_plan(constraints)
-            recipe = generate_recipe(plan)
-            nutrition = await compute_nutrition(recipe)
-        except Exception:
-            await MCPClientManager.stop_server()
-            raise
-        
-        # Define units for micronutrients
-        mcg_nutrients = {"vitamin_a_mcg", "vitamin_d_mcg", "vitamin_k_mcg", "folate_mcg", "vitamin_b12_mcg"}
-        
-        formatted_nutrition = {
-            "calories": f"{nutrition.calories} kcal",
-            "macros": {k: f"{v} g" for k, v in nutrition.macros.items()},
-            "micros": {
-                k: f"{v} mcg" if k in mcg_nutrients else f"{v} mg"
-                for k, v in nutrition.micros.items()
-            },
-        }
-
-        output = {
-            "plan": plan.model_dump(),
-            "recipe": recipe.model_dump(),
-            "nutrition": formatted_nutrition,
-        }
-        print(json.dumps(output, indent=2))
-        
-    finally:
-        await MCPClientManager.stop_server()
+    constraints = UserNeeds(
+        cuisine=args.cuisine,
+        max_prep_time=args.max_prep_time,
+        dietary_needs=args.dietary_needs
+    )
+    plan = await generate_plan_async(constraints)
+    recipe = await generate_recipe_async(plan)
+    nutrition = await compute_nutrition(recipe)
+    return plan, recipe, nutrition
 
 
-async def run_ingredient_mode(args):
+async def run_ingredient_mode(args) -> Tuple[Plan, Recipe, NutritionProfile]:
     """Run ingredient-based recipe generation with AI agents"""
-    try:
-        await MCPClientManager.start_server()
-        
-        try:
-            plan = generate_ingredient_plan(args.request)
-            
-            nutrition_goals = args.nutrition_goals or "balanced nutrition"
-            recipe = generate_nutrition_aware_recipe(plan, nutrition_goals)
-            
-            nutrition = await compute_nutrition(recipe)
-        except Exception:
-            await MCPClientManager.stop_server()
-            raise
-        
-        # Define units for micronutrients
-        mcg_nutrients = {"vitamin_a_mcg", "vitamin_d_mcg", "vitamin_k_mcg", "folate_mcg", "vitamin_b12_mcg"}
-        
-        formatted_nutrition = {
-            "calories": f"{nutrition.calories} kcal",
-            "macros": {k: f"{v} g" for k, v in nutrition.macros.items()},
-            "micros": {
-                k: f"{v} mcg" if k in mcg_nutrients else f"{v} mg"
-                for k, v in nutrition.micros.items()
-            },
-        }
-
-        output = {
-            "plan": plan.model_dump(),
-            "recipe": recipe.model_dump(),
-            "nutrition": formatted_nutrition,
-        }
-        print(json.dumps(output, indent=2))
-        
-    finally:
-        await MCPClientManager.stop_server()
+    plan = await generate_ingredient_plan_async(args.request)
+    
+    nutrition_goals = args.nutrition_goals or "balanced nutrition"
+    recipe = await generate_nutrition_aware_recipe_async(plan, nutrition_goals)
+    
+    nutrition = await compute_nutrition(recipe)
+    return plan, recipe, nutrition
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,30 +3,73 @@
 Async MCP Client for nutrition operations using async subprocess communication
 """
 
-import json
 import asyncio
+import re
 import subprocess
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional, Tuple
+
+import orjson
 from src.models import Recipe
 
+# Largest single JSON-RPC line accepted from the server (asyncio's default is 64 KiB)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# Leading number of a quantity string, e.g. "200" in "200 g" - not followed by
+# further digits, dots or slashes, so fractions like "1/2" fall back to the default
+_QUANTITY_RE = re.compile(r"\s*(\d+(?:\.\d+)?|\.\d+)(?![\d./])")
+DEFAULT_QUANTITY_GRAMS = 100.0
+
+
+def _quantity_grams(qty: str) -> float:
+    """Parse the gram amount from an ingredient quantity, defaulting to 100g"""
+    match = _QUANTITY_RE.match(qty)
+    return float(match.group(1)) if match else DEFAULT_QUANTITY_GRAMS
+
 
 class AsyncNutritionMCPClient:
-    """Async MCP client using async subprocess communication"""
+    """
+    Async MCP client using async subprocess communication
+    
+    With the default "inprocess" transport the server's tools run in this
+    interpreter and are called directly, skipping the subprocess and the
+    JSON-RPC round-trip. "subprocess" runs the real MCP server over stdio.
+    """
     
-    def __init__(self, server_script: str = "nutrition_mcp/mcp_server.py"):
+    def __init__(self, server_script: str = "nutrition_mcp/mcp_server.py",
+                 transport: Literal["subprocess", "inprocess"] = "inprocess"):
+        if transport not in ("subprocess", "inprocess"):
+            raise ValueError(f"Unknown MCP transport: {transport}")
         self.server_script = server_script
+        self.transport = transport
         self.server_process = None
+        # In-process server, when transport is "inprocess"
+        self._server = None
         self.request_id = 1
+        # Responses are matched to requests by id, so many can be in flight at once
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task: Optional[asyncio.Task] = None
     
     async def start_server(self):
         """Start the MCP server process"""
+        if self.transport == "inprocess":
+            # Imported here so subprocess clients never load the database code
+            from nutrition_mcp.mcp_server import NutritionMCPServer
+            server = NutritionMCPServer()
+            await server._ensure_db()
+            self._server = server
+            return
+        
         self.server_process = await asyncio.create_subprocess_exec(
             "uv", "run", "python", self.server_script,
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd="."
+            # Nothing reads the server's logs - a captured stderr pipe would fill
+            # up and block the server mid-write, stalling every tool call
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=".",
+            limit=MAX_MESSAGE_BYTES
         )
+        self._reader_task = asyncio.create_task(self._read_responses(self.server_process))
         
         # Initialize MCP connection
         await self._initialize_connection()
@@ -62,6 +105,13 @@ class AsyncNutritionMCPClient:
         }
         await self._send_notification(initialized_notification)
     
+    def is_running(self) -> bool:
+        """Whether the server process is up"""
+        if self.transport == "inprocess":
+            return self._server is not None
+        return (self.server_process is not None and self.server_process.returncode is None
+                and self._reader_task is not None and not self._reader_task.done())
+    
     def _next_id(self) -> int:
         """Get next request ID"""
         current = self.request_id
@@ -70,89 +120,171 @@ class AsyncNutritionMCPClient:
     
     async def _send_request(self, request: Dict) -> Dict:
         """Send request to MCP server and get response"""
+        return (await self._send_requests([request]))[0]
+    
+    async def _send_requests(self, requests: List[Dict]) -> List[Dict]:
+        """Write several requests back to back, then wait for all of their responses"""
         if not self.server_process:
             raise RuntimeError("Server not started")
+        if self._reader_task is None or self._reader_task.done():
+            raise RuntimeError("Server closed connection")
         
-        # Send request
-        request_str = json.dumps(request) + "\n"
-        self.server_process.stdin.write(request_str.encode())
-        await self.server_process.stdin.drain()
-        
-        # Read response
-        while True:
-            line = await self.server_process.stdout.readline()
-            if not line:
-                raise RuntimeError("Server closed connection")
+        loop = asyncio.get_running_loop()
+        responses = []
+        try:
+            # Queue every request before waiting on any, so the server can work on them together
+            for request in requests:
+                response = loop.create_future()
+                self._pending[request["id"]] = response
+                responses.append(response)
+                self.server_process.stdin.write(orjson.dumps(request) + b"\n")
+            await self.server_process.stdin.drain()
             
-            try:
-                response = json.loads(line.decode().strip())
-                # Check if this is the response to our request
-                if "id" in response and response.get("id") == request.get("id"):
-                    return response
+            return list(await asyncio.gather(*responses))
+        finally:
+            for request in requests:
+                self._pending.pop(request["id"], None)
+    
+    async def _read_responses(self, process):
+        """Route each response line from the server to the request waiting on its id"""
+        try:
+            while True:
+                try:
+                    line = await process.stdout.readuntil(b"\n")
+                except asyncio.IncompleteReadError:
+                    break  # EOF - the server exited
+                except asyncio.LimitOverrunError:
+                    # A response larger than MAX_MESSAGE_BYTES can't be matched to its
+                    # request, so stop the server and fail callers instead of leaving
+                    # them hanging; drain the pipe so the process can be reaped
+                    process.kill()
+                    await process.stdout.read()
+                    break
+                
+                # Notifications carry no id - skip them without a full JSON parse
+                if b'"id"' not in line:
+                    continue
+                
+                try:
+                    response = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                
                 # Skip notifications or other messages
-            except json.JSONDecodeError:
-                continue
+                waiter = self._pending.get(response.get("id")) if isinstance(response, dict) else None
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(response)
+        finally:
+            for waiter in self._pending.values():
+                if not waiter.done():
+                    waiter.set_exception(RuntimeError("Server closed connection"))
     
     async def _send_notification(self, notification: Dict):
         """Send notification to MCP server"""
         if not self.server_process:
             raise RuntimeError("Server not started")
         
-        notification_str = json.dumps(notification) + "\n"
-        self.server_process.stdin.write(notification_str.encode())
+        self.server_process.stdin.write(orjson.dumps(notification) + b"\n")
         await self.server_process.stdin.drain()
     
     async def call_tool(self, tool_name: str, arguments: Dict) -> Any:
         """Call a tool on the MCP server"""
-        request = {
-            "jsonrpc": "2.0",
-            "id": self._next_id(),
-            "method": "tools/call",
-            "params": {
-                "name": tool_name,
-                "arguments": arguments
-            }
-        }
+        return (await self.call_tools([(tool_name, arguments)]))[0]
+    
+    async def call_tools(self, calls: List[Tuple[str, Dict]]) -> List[Any]:
+        """
+        Call several tools in one pipelined burst
+        
+        Args:
+            calls: (tool_name, arguments) pairs
+            
+        Returns:
+            Tool results in the same order as calls
+        """
+        if self.transport == "inprocess":
+            if self._server is None:
+                raise RuntimeError("Server not started")
+            return list(await asyncio.gather(*(
+                self._server.call_tool(tool_name, arguments) for tool_name, arguments in calls
+            )))
         
-        response = await self._send_request(request)
+        requests = [
+            {
+                "jsonrpc": "2.0",
+                "id": self._next_id(),
+                "method": "tools/call",
+                "params": {
+                    "name": tool_name,
+                    "arguments": arguments
+                }
+            }
+            for tool_name, arguments in calls
+        ]
         
+        responses = await self._send_requests(requests)
+        return [self._tool_result(response) for response in responses]
+    
+    @staticmethod
+    def _tool_result(response: Dict) -> Any:
+        """Extract the decoded tool output from a tools/call response"""
         if "error" in response:
             raise RuntimeError(f"MCP tool error: {response['error']}")
         
         # Parse tool response
         if "result" in response and "content" in response["result"]:
             content = response["result"]["content"][0]["text"]
-            return json.loads(content)
+            return orjson.loads(content)
         
         return None
     
     async def calculate_recipe_nutrition(self, recipe: Recipe) -> Dict:
         """Calculate recipe nutrition using MCP server"""
-        # Convert recipe ingredients to MCP format
-        ingredients = []
-        for ingredient in recipe.ingredients:
-            try:
-                quantity_grams = float(ingredient.qty.split()[0]) if ingredient.qty else 100.0
-            except (ValueError, IndexError):
-                quantity_grams = 100.0
-            
-            ingredients.append({
-                "name": ingredient.item,
-                "quantity_grams": quantity_grams
-            })
-        
         return await self.call_tool("calculate_recipe_nutrition", {
-            "ingredients": ingredients
+            "ingredients": self._to_mcp_ingredients(recipe)
+        })
+    
+    async def calculate_recipe_nutrition_many(self, recipes: List[Recipe]) -> List[Dict]:
+        """Calculate nutrition for several recipes as pipelined per-recipe tool calls"""
+        return await self.call_tools([
+            ("calculate_recipe_nutrition", {"ingredients": self._to_mcp_ingredients(recipe)})
+            for recipe in recipes
+        ])
+    
+    async def calculate_recipes_nutrition(self, recipes: List[Recipe]) -> Dict:
+        """Calculate nutrition for several recipes in a single MCP round-trip"""
+        return await self.call_tool("calculate_recipes_nutrition", {
+            "recipes": [{"ingredients": self._to_mcp_ingredients(recipe)} for recipe in recipes]
         })
     
+    @staticmethod
+    def _to_mcp_ingredients(recipe: Recipe) -> List[Dict[str, Any]]:
+        """Convert recipe ingredients to MCP format"""
+        return [
+            {"name": ingredient.item, "quantity_grams": _quantity_grams(ingredient.qty)}
+            for ingredient in recipe.ingredients
+        ]
+    
     async def stop_server(self):
-        """Stop the MCP server process"""
-        if self.server_process:
-            self.server_process.terminate()
-            try:
-                await asyncio.wait_for(self.server_process.wait(), timeout=5.0)
-            except asyncio.TimeoutError:
-                self.server_process.kill()
-                await self.server_process.wait()
+        """Stop the MCP server process (no-op if it is already stopped)"""
+        server, self._server = self._server, None
+        if server is not None:
+            server.cleanup()
+        
+        process, self.server_process = self.server_process, None
+        reader_task, self._reader_task = self._reader_task, None
+        if reader_task is not None:
+            reader_task.cancel()
+        if process is None or process.returncode is not None:
+            return
+        
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
 
 
@@ -5,13 +5,19 @@ MCP Server for Nutrition Database
 Provides nutrition data from TinyDB as MCP resources and tools for AI agents.
 """
 
-import json
 import asyncio
 import sys
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional - fall back to the stock asyncio event loop
+    uvloop = None
+
 # Add project root to path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
@@ -23,111 +29,133 @@ import mcp.types as types
 
 from database import NutritionDB
 
-class NutritionMCPServer:
-    """MCP Server for nutrition database operations"""
-    
-    def __init__(self):
-        self.server = Server("nutrition-db")
-        self.db_path = "data/nutrition.json"
-        self.nutrition_db = None
-        
-        # Register handlers
-        self._register_handlers()
-    
-    def _register_handlers(self):
-        """Register all MCP handlers"""
-        
-        @self.server.list_tools()
-        async def handle_list_tools() -> list[types.Tool]:
-            """List available tools"""
-            return [
-                types.Tool(
-                    name="find_ingredient",
-                    description="Find nutrition data for an ingredient using fuzzy matching",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "ingredient_name": {
-                                "type": "string",
-                                "description": "Name of the ingredient to search for"
-                            },
-                            "max_results": {
-                                "type": "integer",
-                                "description": "Maximum number of results to return",
-                                "default": 5
-                            }
-                        },
-                        "required": ["ingredient_name"]
-                    }
-                ),
-                types.Tool(
-                    name="get_nutrition_by_id",
-                    description="Get nutrition data by exact food_id",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "food_id": {
-                                "type": "string",
-                                "description": "Exact food_id to look up"
-                            }
-                        },
-                        "required": ["food_id"]
-                    }
-                ),
-                types.Tool(
-                    name="search_ingredients",
-                    description="Search ingredients by description keywords",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "description": {
-                                "type": "string",
-                                "description": "Keywords to search for in food descriptions"
-                            }
-                        },
-                        "required": ["description"]
-                    }
-                ),
-                types.Tool(
-                    name="add_ingredient",
-                    description="Add new ingredient using LLM nutrition estimation",
-                    inputSchema={
+# All nutrition fields from database, summed by calculate_recipe_nutrition
+NUTRIENTS = (
+    "calories", "protein", "fat", "carbs", "fiber",
+    "iron_mg", "calcium_mg", "zinc_mg", "magnesium_mg",
+    "potassium_mg", "sodium_mg", "vitamin_c_mg",
+    "vitamin_a_mcg", "vitamin_d_mcg", "vitamin_e_mg",
+    "vitamin_k_mcg", "thiamin_mg", "riboflavin_mg",
+    "niacin_mg", "vitamin_b6_mg", "folate_mcg", "vitamin_b12_mcg",
+)
+
+# Tool definitions are static, so build them once rather than on every list_tools request
+TOOLS = [
+    types.Tool(
+        name="find_ingredient",
+        description="Find nutrition data for an ingredient using fuzzy matching",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ingredient_name": {
+                    "type": "string",
+                    "description": "Name of the ingredient to search for"
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of results to return",
+                    "default": 5
+                }
+            },
+            "required": ["ingredient_name"]
+        }
+    ),
+    types.Tool(
+        name="get_nutrition_by_id",
+        description="Get nutrition data by exact food_id",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "food_id": {
+                    "type": "string",
+                    "description": "Exact food_id to look up"
+                }
+            },
+            "required": ["food_id"]
+        }
+    ),
+    types.Tool(
+        name="search_ingredients",
+        description="Search ingredients by description keywords",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "description": {
+                    "type": "string",
+                    "description": "Keywords to search for in food descriptions"
+                }
+            },
+            "required": ["description"]
+        }
+    ),
+    types.Tool(
+        name="add_ingredient",
+        description="Add new ingredient using LLM nutrition estimation",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ingredient_name": {
+                    "type": "string",
+                    "description": "Name of the ingredient to add"
+                }
+            },
+            "required": ["ingredient_name"]
+        }
+    ),
+    types.Tool(
+        name="get_high_protein_foods",
+        description="Find foods with protein content above threshold",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "min_protein": {
+                    "type": "number",
+                    "description": "Minimum protein content in grams per 100g",
+                    "default": 20.0
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="get_database_stats",
+        description="Get comprehensive database statistics",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    types.Tool(
+        name="calculate_recipe_nutrition",
+        description="Calculate total nutrition for a recipe with ingredients and quantities",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ingredients": {
+                    "type": "array",
+                    "description": "List of ingredients with names and quantities",
+                    "items": {
                         "type": "object",
                         "properties": {
-                            "ingredient_name": {
-                                "type": "string",
-                                "description": "Name of the ingredient to add"
-                            }
+                            "name": {"type": "string", "description": "Ingredient name"},
+                            "quantity_grams": {"type": "number", "description": "Quantity in grams"}
                         },
-                        "required": ["ingredient_name"]
+                        "required": ["name", "quantity_grams"]
                     }
-                ),
-                types.Tool(
-                    name="get_high_protein_foods",
-                    description="Find foods with protein content above threshold",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "min_protein": {
-                                "type": "number",
-                                "description": "Minimum protein content in grams per 100g",
-                                "default": 20.0
-                            }
-                        }
-                    }
-                ),
-                types.Tool(
-                    name="get_database_stats",
-                    description="Get comprehensive database statistics",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {}
-                    }
-                ),
-                types.Tool(
-                    name="calculate_recipe_nutrition",
-                    description="Calculate total nutrition for a recipe with ingredients and quantities",
-                    inputSchema={
+                }
+            },
+            "required": ["ingredients"]
+        }
+    ),
+    types.Tool(
+        name="calculate_recipes_nutrition",
+        description="Calculate total nutrition for several recipes in one call",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "recipes": {
+                    "type": "array",
+                    "description": "Recipes, each with its list of ingredients",
+                    "items": {
                         "type": "object",
                         "properties": {
                             "ingredients": {
@@ -145,179 +173,275 @@ class NutritionMCPServer:
                         },
                         "required": ["ingredients"]
                     }
-                )
-            ]
+                }
+            },
+            "required": ["recipes"]
+        }
+    )
+]
+
+# Maximum number of ingredient name resolutions kept by the server
+RESOLVED_CACHE_SIZE = 4096
+
+# Tools with large list results, sent without indentation
+COMPACT_TOOLS = {"find_ingredient", "search_ingredients", "get_high_protein_foods", "calculate_recipes_nutrition"}
+
+def _dumps(obj: Any, compact: bool = False) -> str:
+    """
+    Serialize a tool response as JSON
+    
+    Args:
+        obj: Response payload
+        compact: Skip indentation - for responses carrying many food documents,
+            where whitespace adds about a third to the text sent over stdio
+    
+    Returns:
+        JSON text
+    """
+    if compact:
+        return orjson.dumps(obj).decode()
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+class NutritionMCPServer:
+    """MCP Server for nutrition database operations"""
+    
+    def __init__(self):
+        self.server = Server("nutrition-db")
+        self.db_path = "data/nutrition.json"
+        self.nutrition_db = None
+        self._db_lock = asyncio.Lock()
+        # Ingredient name (stripped, lowercased) -> resolved food, or None for no match.
+        # The server never adds foods (auto_add=False), so entries stay valid
+        self._resolved: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        # Register handlers
+        self._register_handlers()
+    
+    def _register_handlers(self):
+        """Register all MCP handlers"""
+        
+        @self.server.list_tools()
+        async def handle_list_tools() -> list[types.Tool]:
+            """List available tools"""
+            return TOOLS
         
         @self.server.call_tool()
         async def handle_call_tool(name: str, arguments: dict) -> list[types.TextContent]:
             """Handle tool calls"""
+            result = await self.call_tool(name, arguments)
+            return [types.TextContent(
+                type="text",
+                text=_dumps(result, compact=name in COMPACT_TOOLS)
+            )]
+    
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a tool and return its result without JSON encoding it
+        
+        The stdio handler serializes this for MCP clients; in-process clients
+        call it directly. Results may share objects with the database, so
+        treat them as read-only.
+        
+        Args:
+            name: Tool name
+            arguments: Tool arguments
             
-            # Initialize database if needed (without LLM to avoid API key requirements)
-            if not self.nutrition_db:
-                self.nutrition_db = NutritionDB(self.db_path, enable_llm=False)
+        Returns:
+            Tool result, or a dict with an 'error' key if the call failed
+        """
+        await self._ensure_db()
+        
+        try:
+            if name == "find_ingredient":
+                ingredient_name = arguments["ingredient_name"]
+                max_results = arguments.get("max_results", 5)
+                
+                results = self.nutrition_db.find_ingredient(ingredient_name, max_results)
+                
+                return {
+                    "ingredient_searched": ingredient_name,
+                    "results_found": len(results),
+                    "matches": results
+                }
             
-            try:
-                if name == "find_ingredient":
-                    ingredient_name = arguments["ingredient_name"]
-                    max_results = arguments.get("max_results", 5)
-                    
-                    results = self.nutrition_db.find_ingredient(ingredient_name, max_results)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "ingredient_searched": ingredient_name,
-                            "results_found": len(results),
-                            "matches": results
-                        }, indent=2)
-                    )]
+            elif name == "get_nutrition_by_id":
+                food_id = arguments["food_id"]
+                result = self.nutrition_db.get_food_by_id(food_id)
                 
-                elif name == "get_nutrition_by_id":
-                    food_id = arguments["food_id"]
-                    result = self.nutrition_db.get_food_by_id(food_id)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "food_id": food_id,
-                            "found": result is not None,
-                            "data": result
-                        }, indent=2)
-                    )]
+                return {
+                    "food_id": food_id,
+                    "found": result is not None,
+                    "data": result
+                }
+            
+            elif name == "search_ingredients":
+                description = arguments["description"]
+                results = self.nutrition_db.search_by_description(description)
+                
+                return {
+                    "search_term": description,
+                    "results_found": len(results),
+                    "matches": results
+                }
+            
+            elif name == "add_ingredient":
+                ingredient_name = arguments["ingredient_name"]
+                result = self.nutrition_db.find_or_create_ingredient(ingredient_name, auto_add=False)
                 
-                elif name == "search_ingredients":
-                    description = arguments["description"]
-                    results = self.nutrition_db.search_by_description(description)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "search_term": description,
-                            "results_found": len(results),
-                            "matches": results
-                        }, indent=2)
-                    )]
+                return {
+                    "ingredient_name": ingredient_name,
+                    "added": result is not None,
+                    "data": result
+                }
+            
+            elif name == "get_high_protein_foods":
+                min_protein = arguments.get("min_protein", 20.0)
+                results = self.nutrition_db.get_high_protein_foods(min_protein)
                 
-                elif name == "add_ingredient":
-                    ingredient_name = arguments["ingredient_name"]
-                    result = self.nutrition_db.find_or_create_ingredient(ingredient_name, auto_add=False)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "ingredient_name": ingredient_name,
-                            "added": result is not None,
-                            "data": result
-                        }, indent=2)
-                    )]
+                return {
+                    "min_protein_threshold": min_protein,
+                    "foods_found": len(results),
+                    "high_protein_foods": results
+                }
+            
+            elif name == "get_database_stats":
+                stats = self.nutrition_db.get_database_stats()
                 
-                elif name == "get_high_protein_foods":
-                    min_protein = arguments.get("min_protein", 20.0)
-                    results = self.nutrition_db.get_high_protein_foods(min_protein)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "min_protein_threshold": min_protein,
-                            "foods_found": len(results),
-                            "high_protein_foods": results
-                        }, indent=2)
-                    )]
+                return {
+                    "database_statistics": stats
+                }
+            
+            elif name == "calculate_recipe_nutrition":
+                ingredients = arguments["ingredients"]
+                total_nutrition, ingredient_details = await self._calculate_recipe_nutrition(ingredients)
                 
-                elif name == "get_database_stats":
-                    stats = self.nutrition_db.get_database_stats()
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "database_statistics": stats
-                        }, indent=2)
-                    )]
+                return {
+                    "recipe_nutrition": total_nutrition,
+                    "ingredient_breakdown": ingredient_details
+                }
+            
+            elif name == "calculate_recipes_nutrition":
+                results = await asyncio.gather(*[
+                    self._calculate_recipe_nutrition(recipe["ingredients"])
+                    for recipe in arguments["recipes"]
+                ])
                 
-                elif name == "calculate_recipe_nutrition":
-                    ingredients = arguments["ingredients"]
-                    
-                    # Calculate total nutrition for recipe
-                    # All nutrition fields from database
-                    total_nutrition = {
-                        "calories": 0, "protein": 0, "fat": 0, "carbs": 0, "fiber": 0,
-                        "iron_mg": 0, "calcium_mg": 0, "zinc_mg": 0, "magnesium_mg": 0,
-                        "potassium_mg": 0, "sodium_mg": 0, "vitamin_c_mg": 0,
-                        "vitamin_a_mcg": 0, "vitamin_d_mcg": 0, "vitamin_e_mg": 0,
-                        "vitamin_k_mcg": 0, "thiamin_mg": 0, "riboflavin_mg": 0,
-                        "niacin_mg": 0, "vitamin_b6_mg": 0, "folate_mcg": 0, "vitamin_b12_mcg": 0
-                    }
-                    
-                    ingredient_details = []
-                    
-                    for ingredient in ingredients:
-                        name = ingredient["name"]
-                        quantity_grams = ingredient["quantity_grams"]
-                        
-                        # Find ingredient nutrition data (no auto-add to avoid LLM)
-                        food_data = self.nutrition_db.find_or_create_ingredient(name, auto_add=False)
-                        
-                        # If not found, try fuzzy matching only
-                        if not food_data:
-                            matches = self.nutrition_db.find_ingredient(name, max_results=1)
-                            if matches and matches[0].get('match_score', 0) >= 0.7:
-                                food_data = matches[0]
-                            else:
-                                ingredient_details.append({
-                                    "name": name,
-                                    "quantity_grams": quantity_grams,
-                                    "error": f"No nutrition data found for '{name}'"
-                                })
-                                continue
-                        
-                        if food_data:
-                            # Scale nutrition data based on quantity (data is per 100g)
-                            scale_factor = quantity_grams / 100.0
-                            
-                            ingredient_nutrition = {}
-                            for nutrient in total_nutrition.keys():
-                                value = food_data.get(nutrient, 0) * scale_factor
-                                total_nutrition[nutrient] += value
-                                ingredient_nutrition[nutrient] = round(value, 2)
-                            
-                            ingredient_details.append({
-                                "name": name,
-                                "quantity_grams": quantity_grams,
-                                "nutrition": ingredient_nutrition,
-                                "food_id": food_data.get("food_id"),
-                                "source": food_data.get("source")
-                            })
-                        else:
-                            ingredient_details.append({
-                                "name": name,
-                                "quantity_grams": quantity_grams,
-                                "error": "Could not find or estimate nutrition data"
-                            })
-                    
-                    # Round total values
-                    for nutrient in total_nutrition:
-                        total_nutrition[nutrient] = round(total_nutrition[nutrient], 2)
-                    
-                    return [types.TextContent(
-                        type="text",
-                        text=json.dumps({
-                            "recipe_nutrition": total_nutrition,
-                            "ingredient_breakdown": ingredient_details
-                        }, indent=2)
-                    )]
+                return {
+                    "recipes": [
+                        {"recipe_nutrition": total_nutrition, "ingredient_breakdown": ingredient_details}
+                        for total_nutrition, ingredient_details in results
+                    ]
+                }
+            
+            else:
+                raise ValueError(f"Unknown tool: {name}")
                 
-                else:
-                    raise ValueError(f"Unknown tool: {name}")
-                    
-            except Exception as e:
-                return [types.TextContent(
-                    type="text",
-                    text=json.dumps({
-                        "error": str(e),
-                        "tool": name,
-                        "arguments": arguments
-                    }, indent=2)
-                )]
+        except Exception as e:
+            return {
+                "error": str(e),
+                "tool": name,
+                "arguments": arguments
+            }
+    
+    async def _ensure_db(self):
+        """Open the nutrition database once, even if several tool calls arrive together"""
+        async with self._db_lock:
+            if not self.nutrition_db:
+                # Without LLM to avoid API key requirements; loading the file is
+                # blocking work, so keep it off the event loop
+                self.nutrition_db = await asyncio.to_thread(NutritionDB, self.db_path, enable_llm=False)
+    
+    def _remember_resolved(self, key: str, food_data: Optional[Dict[str, Any]]) -> None:
+        """Cache an ingredient resolution, evicting the oldest entry when full"""
+        if len(self._resolved) >= RESOLVED_CACHE_SIZE:
+            self._resolved.pop(next(iter(self._resolved)))
+        self._resolved[key] = food_data
+    
+    def _resolve_ingredient(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Find nutrition data for one recipe ingredient
+        
+        Args:
+            name: Ingredient name
+            
+        Returns:
+            Food document, or None if no good enough match exists
+        """
+        # Find ingredient nutrition data (no auto-add to avoid LLM)
+        food_data = self.nutrition_db.find_or_create_ingredient(name, auto_add=False)
+        
+        # If not found, try fuzzy matching only
+        if not food_data:
+            matches = self.nutrition_db.find_ingredient(name, max_results=1)
+            if matches and matches[0].get('match_score', 0) >= 0.7:
+                food_data = matches[0]
+        
+        return food_data
+    
+    async def _calculate_recipe_nutrition(self, ingredients: List[Dict[str, Any]]) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+        """
+        Calculate total nutrition for a recipe
+        
+        Args:
+            ingredients: Ingredients with 'name' and 'quantity_grams'
+            
+        Returns:
+            Tuple of (total nutrition, per-ingredient breakdown)
+        """
+        # Recipes can repeat an ingredient - look each distinct name up once
+        unique_names = {}
+        for ingredient in ingredients:
+            unique_names.setdefault(ingredient["name"].strip().lower(), ingredient["name"])
+        
+        # Names resolved before are a dict lookup. New names need a (fuzzy)
+        # database search; that is CPU-bound, so threads can't run lookups in
+        # parallel - do them all in one worker call to keep the event loop free
+        foods_by_name = {key: self._resolved[key] for key in unique_names if key in self._resolved}
+        unresolved = [key for key in unique_names if key not in foods_by_name]
+        if unresolved:
+            resolved = await asyncio.to_thread(
+                lambda: [self._resolve_ingredient(unique_names[key]) for key in unresolved]
+            )
+            for key, food_data in zip(unresolved, resolved):
+                foods_by_name[key] = food_data
+                self._remember_resolved(key, food_data)
+        foods = [foods_by_name[ingredient["name"].strip().lower()] for ingredient in ingredients]
+        
+        ingredient_details = []
+        totals = [0.0] * len(NUTRIENTS)
+        
+        for ingredient, food_data in zip(ingredients, foods):
+            name = ingredient["name"]
+            quantity_grams = ingredient["quantity_grams"]
+            
+            if not food_data:
+                ingredient_details.append({
+                    "name": name,
+                    "quantity_grams": quantity_grams,
+                    "error": f"No nutrition data found for '{name}'"
+                })
+                continue
+            
+            # Scale nutrition data based on quantity (data is per 100g)
+            scale_factor = quantity_grams / 100.0
+            ingredient_nutrition = {}
+            for index, nutrient in enumerate(NUTRIENTS):
+                value = food_data.get(nutrient, 0) * scale_factor
+                totals[index] += value
+                ingredient_nutrition[nutrient] = round(value, 2)
+            
+            ingredient_details.append({
+                "name": name,
+                "quantity_grams": quantity_grams,
+                "nutrition": ingredient_nutrition,
+                "food_id": food_data.get("food_id"),
+                "source": food_data.get("source")
+            })
+        
+        # Round total values
+        total_nutrition = {nutrient: round(total, 2) for nutrient, total in zip(NUTRIENTS, totals)}
+        
+        return total_nutrition, ingredient_details
     
     def cleanup(self):
         """Clean up resources"""
@@ -326,6 +450,9 @@ class NutritionMCPServer:
     
     async def run(self):
         """Run the MCP server"""
+        # Load the database before serving so the first tool call doesn't pay for it
+        await self._ensure_db()
+        
         async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
             await self.server.run(
                 read_stream,
@@ -349,4 +476,5 @@ async def main():
         server.cleanup()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # The stdio transport and to_thread lookups run noticeably faster on libuv
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
\ No newline at end of file
@@ -3,6 +3,7 @@
 Setup nutrition database for first-time users
 """
 
+import argparse
 from pathlib import Path
 from database.converters import convert_nutrition_data
 
@@ -38,5 +39,22 @@ def setup_nutrition_database():
         print("Failed to setup nutrition database")
         return False
 
+def preload_ingredients(path: str):
+    """Add LLM estimates for every ingredient listed in path (one per line) using the Batch API"""
+    from database import NutritionDB
+    
+    with open(path) as f:
+        ingredient_names = [line.strip() for line in f if line.strip()]
+    
+    with NutritionDB("data/nutrition.json") as db:
+        added = db.preload_ingredients(ingredient_names)
+    print(f"Added {added} of {len(ingredient_names)} ingredients to the nutrition database")
+
 if __name__ == "__main__":
-    setup_nutrition_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Setup nutrition database")
+    parser.add_argument("--preload", metavar="FILE",
+                        help="Estimate missing ingredients listed in FILE (one per line) with the OpenAI Batch API")
+    args = parser.parse_args()
+    
+    if setup_nutrition_database() and args.preload:
+        preload_ingredients(args.preload)
\ No newline at end of file
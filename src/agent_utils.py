@@ -2,37 +2,113 @@
 Shared utilities for LangChain agents
 """
 
-import json
-import re
-from typing import Type, TypeVar, Dict, Any
+from typing import Type, TypeVar, Dict, Any, List, Tuple, Union
+
+import orjson
 from langchain.agents import create_react_agent, AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish
 from langchain.prompts import PromptTemplate
+from langchain_core.language_models import BaseLLM
 from pydantic import BaseModel, ValidationError
 
 from src.llm_config import get_completion_llm
-from src.mcp_tools import get_nutrition_tools
+from src.mcp_tools import get_nutrition_tools, tool_call_memo
+from utils.json_extract import extract_first_json_object
 
 T = TypeVar('T', bound=BaseModel)
 
 
+# Built executors keyed by (id(prompt), temperature, max_iterations). Each entry
+# keeps its prompt alive so the id can't be reused, and the LLM it was built
+# with so a set_temperature() reset is noticed
+_AGENT_CACHE: Dict[Tuple[int, float, int], Tuple[PromptTemplate, BaseLLM, AgentExecutor]] = {}
+
+# Tools are stateless wrappers around the shared MCP client, so one set serves every agent
+_TOOLS = get_nutrition_tools()
+
+# Observation substituted for a repeated tool call, steering a looping agent to finish
+REPEATED_ACTION_OBSERVATION = (
+    "You already ran this exact action - its result is in an earlier Observation. "
+    "Do not repeat actions; give your Final Answer now."
+)
+
+NextStep = Union[AgentFinish, List[Tuple[AgentAction, str]]]
+
+
+def _action_key(action: AgentAction) -> Tuple[str, str]:
+    """Identify a tool call by tool name and input, ignoring JSON key order and whitespace"""
+    tool_input = action.tool_input
+    if isinstance(tool_input, str):
+        try:
+            tool_input = orjson.loads(tool_input)
+        except orjson.JSONDecodeError:
+            return action.tool, tool_input.strip()
+    return action.tool, orjson.dumps(tool_input, option=orjson.OPT_SORT_KEYS).decode()
+
+
+class LoopGuardAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that cuts ReAct loops short
+    
+    The first time the agent repeats an earlier tool call it is told to give its
+    final answer instead of getting the result again; a second repeat stops the run.
+    """
+    
+    def _take_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None) -> NextStep:
+        next_step = super()._take_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        return self._guard_repeats(next_step, intermediate_steps, inputs)
+    
+    async def _atake_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None) -> NextStep:
+        next_step = await super()._atake_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        return self._guard_repeats(next_step, intermediate_steps, inputs)
+    
+    def _guard_repeats(self, next_step: NextStep, intermediate_steps: List[Tuple[AgentAction, str]],
+                       inputs: Dict[str, str]) -> NextStep:
+        """Replace observations of repeated actions, or stop if the agent was already warned"""
+        if isinstance(next_step, AgentFinish):
+            return next_step
+        
+        seen = {_action_key(action) for action, _ in intermediate_steps}
+        warned = any(observation == REPEATED_ACTION_OBSERVATION for _, observation in intermediate_steps)
+        
+        guarded = []
+        for action, observation in next_step:
+            key = _action_key(action)
+            # Output parsing errors (the "_Exception" pseudo-tool) are retries, not loops
+            if key in seen and action.tool != "_Exception":
+                if warned:
+                    return self._action_agent.return_stopped_response(
+                        self.early_stopping_method, intermediate_steps, **inputs
+                    )
+                observation = REPEATED_ACTION_OBSERVATION
+            seen.add(key)
+            guarded.append((action, observation))
+        return guarded
+
+
 def create_agent_executor(prompt: PromptTemplate, temperature: float = 0.7, max_iterations: int = 10) -> AgentExecutor:
-    """Create a standardized agent executor with nutrition tools"""
-    tools = get_nutrition_tools()
+    """Get a standardized agent executor with nutrition tools, reusing one built for the same settings"""
     llm = get_completion_llm(temperature=temperature)
+    key = (id(prompt), temperature, max_iterations)
+    cached = _AGENT_CACHE.get(key)
+    if cached is not None and cached[1] is llm:
+        return cached[2]
     
     agent = create_react_agent(
         llm=llm,
-        tools=tools,
+        tools=_TOOLS,
         prompt=prompt
     )
     
-    return AgentExecutor(
+    agent_executor = LoopGuardAgentExecutor(
         agent=agent,
-        tools=tools,
+        tools=_TOOLS,
         verbose=True,
         handle_parsing_errors=True,
         max_iterations=max_iterations
     )
+    _AGENT_CACHE[key] = (prompt, llm, agent_executor)
+    return agent_executor
 
 
 def parse_json_response(raw_output: str, model_class: Type[T]) -> T:
@@ -40,23 +116,34 @@ def parse_json_response(raw_output: str, model_class: Type[T]) -> T:
     try:
         # Extract JSON after "Final Answer:"
         if "Final Answer:" in raw_output:
-            after_final = raw_output.split("Final Answer:")[-1]
-            json_match = re.search(r'\{.*\}', after_final, re.DOTALL)
+            candidate = raw_output.rpartition("Final Answer:")[2]
         else:
-            json_match = re.search(r'\{.*\}', raw_output, re.DOTALL)
+            candidate = raw_output
         
-        if not json_match:
+        # First balanced {...} object, in one pass - braces inside strings and any
+        # trailing text (even another object) don't affect where it ends
+        json_text = extract_first_json_object(candidate)
+        if json_text is None:
             raise ValueError(f"No JSON found in agent output: {raw_output}")
         
-        data = json.loads(json_match.group(0))
-        return model_class.model_validate(data)
+        # Pydantic decodes and validates in one pass - invalid JSON is a ValidationError too
+        return model_class.model_validate_json(json_text)
         
-    except (json.JSONDecodeError, ValidationError) as e:
+    except ValidationError as e:
         raise ValueError(f"Failed to parse agent output into {model_class.__name__}: {e}\nRaw output: {raw_output}")
 
 
 def run_agent_with_parsing(agent_executor: AgentExecutor, inputs: Dict[str, Any], model_class: Type[T]) -> T:
     """Run agent and parse response into specified Pydantic model"""
-    result = agent_executor.invoke(inputs)
+    # Repeated identical tool calls within one ReAct trace are answered from memory
+    with tool_call_memo():
+        result = agent_executor.invoke(inputs)
     raw_output = result["output"]
-    return parse_json_response(raw_output, model_class)
\ No newline at end of file
+    return parse_json_response(raw_output, model_class)
+
+
+async def run_agent_with_parsing_async(agent_executor: AgentExecutor, inputs: Dict[str, Any], model_class: Type[T]) -> T:
+    """Async version of run_agent_with_parsing - tools await the MCP client on the running loop"""
+    with tool_call_memo():
+        result = await agent_executor.ainvoke(inputs)
+    return parse_json_response(result["output"], model_class)
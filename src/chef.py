@@ -1,20 +1,20 @@
-import json
-import re
+import asyncio
+from typing import Any, Dict, Optional, Tuple
 from langchain.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
 from pydantic import ValidationError
 
 from src.models import Plan, Recipe
-from src.llm_config import get_completion_llm
-from src.agent_utils import create_agent_executor, run_agent_with_parsing
+from src.llm_config import LLM_MODEL, get_chat_llm, get_completion_llm
+from utils.json_extract import IncrementalJsonParser, extract_first_json_object
+from utils.prompt_cache import prompt_cache
 
+# The plan is substituted at the very end, keeping the instructions a stable
+# prefix for OpenAI's automatic prompt caching
 prompt = PromptTemplate(
     input_variables=["plan_json"],
     template="""
-You are a skilled chef. Given this meal plan:
-
-{plan_json}
-
-Generate a complete JSON object matching this schema:
+You are a skilled chef. Given the meal plan below, generate a complete JSON object matching this schema:
 
 {{
   "title": "string",
@@ -35,59 +35,99 @@ NUTRITIONAL SAFETY: Ensure your recipe produces reasonable nutrition levels:
 - Avoid excessive amounts of any single ingredient that could create nutritional imbalances
 
 CRITICAL: Return ONLY the JSON object. No other text, no explanations, no markdown formatting.
+
+MEAL PLAN: {plan_json}
 """,
 )
 
-# Chain created dynamically with increased temperature for recipe variation
-def get_chef_chain():
-    return prompt | get_completion_llm(temperature=1.1)
+# Default temperature gives recipe variation between runs
+CHEF_TEMPERATURE = 1.1
+
+# Responses longer than this are parsed in a worker thread by the async variants
+# so a huge (e.g. runaway) output doesn't stall the event loop
+THREADED_PARSE_MIN_CHARS = 50_000
+
+# Built chains keyed by (chain name, temperature). Each entry keeps the LLM it was
+# built with so a set_temperature() reset is noticed
+_CHAIN_CACHE: Dict[Tuple[str, float], Tuple[Any, Runnable]] = {}
+
+# Chain created with increased temperature for recipe variation.
+# Structured outputs let the API constrain decoding to the Recipe schema, so the
+# response is parsed straight into a Recipe without any JSON/regex post-processing.
+def get_chef_chain(temperature: float = CHEF_TEMPERATURE) -> Runnable:
+    llm = get_chat_llm(temperature=temperature)
+    cached = _CHAIN_CACHE.get(("chef", temperature))
+    if cached is not None and cached[0] is llm:
+        return cached[1]
+    
+    # with_structured_output converts the Recipe schema on every call - build once
+    chain = prompt | llm.with_structured_output(Recipe, method="json_schema", strict=True)
+    _CHAIN_CACHE[("chef", temperature)] = (llm, chain)
+    return chain
 
-def generate_recipe(plan: Plan) -> Recipe:
+def _render_chef_prompt(plan_json: str, temperature: float) -> str:
+    """Prompt text the chef chain sends for a serialized Plan"""
+    return prompt.format(plan_json=plan_json)
+
+def _chef_settings(plan_json: str, temperature: float) -> Tuple[str, float]:
+    """Model and temperature the chef chain sends a prompt with"""
+    return LLM_MODEL, temperature
+
+# Only the LLM call is prompt-cached - the stored JSON is validated again on every hit
+@prompt_cache(_render_chef_prompt, _chef_settings)
+def _call_chef(plan_json: str, temperature: float) -> Optional[str]:
+    """Invoke the chef chain, returning the Recipe as JSON or None for an empty response"""
+    # Structured output returns a Recipe directly
+    recipe = get_chef_chain(temperature).invoke({"plan_json": plan_json})
+    return recipe.model_dump_json() if recipe is not None else None
+
+@prompt_cache(_render_chef_prompt, _chef_settings)
+async def _call_chef_async(plan_json: str, temperature: float) -> Optional[str]:
+    """Async version of _call_chef"""
+    recipe = await get_chef_chain(temperature).ainvoke({"plan_json": plan_json})
+    return recipe.model_dump_json() if recipe is not None else None
+
+def _parse_chef_output(recipe_json: Optional[str]) -> Recipe:
+    """Validate chef output into a Recipe"""
+    # Check for empty response (e.g. refusal)
+    if recipe_json is None:
+        raise ValueError("Chef returned an empty response. Please try again.")
+    return Recipe.model_validate_json(recipe_json)
+
+def generate_recipe(plan: Plan, temperature: float = CHEF_TEMPERATURE) -> Recipe:
     """
-    Take a Plan, call the LLM, parse and validate into a Recipe.
+    Take a Plan, call the LLM, and return the schema-validated Recipe.
     """
     # Serialize the Plan to JSON for the prompt
     plan_json = plan.model_dump_json()
     
-    # Invoke the chain
-    raw: str = get_chef_chain().invoke({"plan_json": plan_json}).strip()
-    
-    # Check for empty response
-    if not raw:
-        raise ValueError("Chef returned an empty response. Please try again.")
-    
-
-    
-    # Try direct JSON load, else extract substring
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        match = re.search(r"\{.*\}", raw, re.DOTALL)
-        if not match:
-            raise ValueError(f"Failed to parse JSON from chef output:\n{raw}")
-        try:
-            data = json.loads(match.group(0))
-        except json.JSONDecodeError:
-            raise ValueError(f"Failed to parse extracted JSON. Raw response:\n{raw}")
+        return _parse_chef_output(_call_chef(plan_json, temperature))
+    except ValidationError as e:
+        raise ValueError(f"Chef output did not match Recipe schema:\n{e}")
+
 
-    # Validate against Recipe model
+async def generate_recipe_async(plan: Plan, temperature: float = CHEF_TEMPERATURE) -> Recipe:
+    """
+    Async version of generate_recipe that doesn't block the event loop during the LLM call.
+    """
+    plan_json = plan.model_dump_json()
+    
     try:
-        recipe = Recipe.model_validate(data)
+        recipe_json = await _call_chef_async(plan_json, temperature)
+        if recipe_json is not None and len(recipe_json) > THREADED_PARSE_MIN_CHARS:
+            return await asyncio.to_thread(_parse_chef_output, recipe_json)
+        return _parse_chef_output(recipe_json)
     except ValidationError as e:
         raise ValueError(f"Chef output did not match Recipe schema:\n{e}")
-    
-    return recipe
 
 
-# Simplified nutrition-aware chef prompt
+# Simplified nutrition-aware chef prompt - static instructions first, per-request values last
 NUTRITION_CHEF_PROMPT = PromptTemplate(
     input_variables=["plan_json", "nutrition_goals"],
     template="""
 You are a nutrition-aware chef. Create a detailed recipe from the meal plan optimized for the nutrition goals.
 
-MEAL PLAN: {plan_json}
-NUTRITION GOALS: {nutrition_goals}
-
 Instructions:
 1. Create a complete recipe with realistic cooking steps
 2. Respect the nutrition goals exactly as specified:
@@ -116,46 +156,105 @@ Return ONLY a valid JSON object with this exact format:
 }}
 
 IMPORTANT: Return ONLY the JSON object, no other text.
+
+MEAL PLAN: {plan_json}
+NUTRITION GOALS: {nutrition_goals}
 """
 )
 
+NUTRITION_CHEF_TEMPERATURE = 0.8
+
+
+def get_nutrition_chef_chain() -> Runnable:
+    """Get the nutrition-aware chef chain - a simple LLM chain instead of an agent"""
+    llm = get_completion_llm(temperature=NUTRITION_CHEF_TEMPERATURE)
+    cached = _CHAIN_CACHE.get(("nutrition_chef", NUTRITION_CHEF_TEMPERATURE))
+    if cached is not None and cached[0] is llm:
+        return cached[1]
+    
+    chain = NUTRITION_CHEF_PROMPT | llm
+    _CHAIN_CACHE[("nutrition_chef", NUTRITION_CHEF_TEMPERATURE)] = (llm, chain)
+    return chain
+
+
+def _render_nutrition_chef_prompt(plan_json: str, nutrition_goals: str) -> str:
+    """Prompt text the nutrition-aware chef chain sends"""
+    return NUTRITION_CHEF_PROMPT.format(plan_json=plan_json, nutrition_goals=nutrition_goals)
+
+
+def _nutrition_chef_settings(plan_json: str, nutrition_goals: str) -> Tuple[str, float]:
+    """Model and temperature the nutrition-aware chef chain sends a prompt with"""
+    return LLM_MODEL, NUTRITION_CHEF_TEMPERATURE
+
+
+@prompt_cache(_render_nutrition_chef_prompt, _nutrition_chef_settings)
+def _stream_nutrition_chef(plan_json: str, nutrition_goals: str) -> str:
+    """Stream the nutrition-aware chef response up to the end of its JSON object"""
+    # Parse as tokens arrive and stop reading as soon as the JSON object
+    # closes (anything after it is discarded anyway)
+    parser = IncrementalJsonParser()
+    for chunk in get_nutrition_chef_chain().stream({
+        "plan_json": plan_json,
+        "nutrition_goals": nutrition_goals
+    }):
+        if parser.push(chunk):
+            break
+    return parser.received()
+
+
+@prompt_cache(_render_nutrition_chef_prompt, _nutrition_chef_settings)
+async def _stream_nutrition_chef_async(plan_json: str, nutrition_goals: str) -> str:
+    """Async version of _stream_nutrition_chef"""
+    parser = IncrementalJsonParser()
+    async for chunk in get_nutrition_chef_chain().astream({
+        "plan_json": plan_json,
+        "nutrition_goals": nutrition_goals
+    }):
+        if parser.push(chunk):
+            break
+    return parser.received()
+
 
 def generate_nutrition_aware_recipe(plan: Plan, nutrition_goals: str = "balanced nutrition") -> Recipe:
     """
     Generate a nutrition-optimized recipe using direct LLM call
     """
-    # Create a simple LLM chain instead of agent
-    chain = NUTRITION_CHEF_PROMPT | get_completion_llm(temperature=0.8)
+    raw_response = _stream_nutrition_chef(plan.model_dump_json(), nutrition_goals)
+    return _parse_nutrition_aware_recipe(raw_response)
+
+
+async def generate_nutrition_aware_recipe_async(plan: Plan, nutrition_goals: str = "balanced nutrition") -> Recipe:
+    """
+    Async version of generate_nutrition_aware_recipe that doesn't block the event loop while streaming.
+    """
+    raw_response = await _stream_nutrition_chef_async(plan.model_dump_json(), nutrition_goals)
+    if len(raw_response) > THREADED_PARSE_MIN_CHARS:
+        return await asyncio.to_thread(_parse_nutrition_aware_recipe, raw_response)
+    return _parse_nutrition_aware_recipe(raw_response)
+
+
+def _parse_nutrition_aware_recipe(raw_response: str) -> Recipe:
+    """Build a Recipe from the first JSON object in a chef response"""
+    raw_response = raw_response.strip()
     
-    # Get response from LLM
-    raw_response = chain.invoke({
-        "plan_json": plan.model_dump_json(),
-        "nutrition_goals": nutrition_goals
-    }).strip()
+    # Fast path: the model followed "Return ONLY the JSON object", so skip the scan.
+    # Anything else (e.g. a second object after the first) falls through to extraction
+    if raw_response.startswith('{') and raw_response.endswith('}'):
+        try:
+            return Recipe.model_validate_json(raw_response)
+        except ValidationError:
+            pass
     
     # Parse JSON response
     try:
-        # Extract first valid JSON block from response
-        # Look for JSON between ```json and ``` or standalone JSON
-        json_pattern = r'```json\s*(\{.*?\})\s*```|\{.*?\}'
-        matches = re.findall(json_pattern, raw_response, re.DOTALL)
-        
-        if matches:
-            # Use first match - either from code block or standalone
-            json_text = matches[0] if matches[0] else raw_response[raw_response.find('{'):raw_response.rfind('}')+1]
-        else:
-            # Fallback to simple extraction
-            json_match = re.search(r'\{.*?\}', raw_response, re.DOTALL)
-            if not json_match:
-                raise ValueError(f"No JSON found in response: {raw_response}")
-            json_text = json_match.group(0)
+        # First balanced JSON object (handles ```json fences and surrounding prose)
+        json_text = extract_first_json_object(raw_response)
+        if json_text is None:
+            raise ValueError(f"No JSON found in response: {raw_response}")
         
-        data = json.loads(json_text)
-        
-        # Validate and create Recipe object
-        recipe = Recipe.model_validate(data)
+        # Decode and validate in one pass, without building an intermediate dict
+        recipe = Recipe.model_validate_json(json_text)
         return recipe
         
-    except (json.JSONDecodeError, ValidationError) as e:
+    except ValidationError as e:
         raise ValueError(f"Failed to parse response into Recipe: {e}\nRaw response: {raw_response}")
-
@@ -5,10 +5,11 @@ Ingredient-based planner agent using LangChain and MCP nutrition tools
 from langchain.prompts import PromptTemplate
 
 from src.models import Plan, Ingredient  
-from src.agent_utils import create_agent_executor, run_agent_with_parsing
+from src.agent_utils import create_agent_executor, run_agent_with_parsing, run_agent_with_parsing_async
 
 
-# ReAct prompt with clear examples
+# ReAct prompt with clear examples. The request sits just before the scratchpad so
+# the tool list, instructions and examples form a prefix shared by every request
 INGREDIENT_PLANNER_PROMPT = PromptTemplate(
     input_variables=["tools", "tool_names", "request", "agent_scratchpad"],
     template="""You are a meal planner that follows user requests exactly. Create simple meal plans based on what the user asks for.
@@ -18,13 +19,12 @@ TOOLS AVAILABLE:
 
 TOOL NAMES: {tool_names}
 
-USER REQUEST: {request}
-
 INSTRUCTIONS:
 - Follow the user's request exactly - don't add extra requirements they didn't ask for
 - If they ask for "simple", keep it simple with 3-4 basic ingredients
 - If they specify ingredients, use those as the main focus
 - Only use tools when needed to find specific ingredients or calculate nutrition
+- To look up several ingredients, use find_ingredients once instead of find_ingredient for each
 - Keep meal plans practical and realistic
 
 You must use the following format:
@@ -43,6 +43,11 @@ Action: find_ingredient
 Action Input: {{"ingredient_name": "potato", "max_results": 3}}
 Observation: {{"ingredient_searched": "potato", "results_found": 2, "matches": [...]}}
 
+Thought: I need nutrition data for the other ingredients too
+Action: find_ingredients
+Action Input: {{"ingredient_names": ["olive oil", "rosemary"], "max_results": 3}}
+Observation: {{"olive oil": {{"ingredient_searched": "olive oil", ...}}, "rosemary": {{"ingredient_searched": "rosemary", ...}}}}
+
 Thought: The user wants a simple potato recipe, so I'll create a basic plan with potatoes and a few complementary ingredients
 Final Answer: {{"meal": "Simple Roasted Potatoes", "ingredients": [{{"item": "potatoes", "qty": "500g"}}, {{"item": "olive oil", "qty": "2 tbsp"}}, {{"item": "salt", "qty": "1 tsp"}}], "dietary_needs": "simple and satisfying"}}
 
@@ -51,6 +56,8 @@ IMPORTANT:
 - Match the user's dietary goals exactly (e.g., if they say "balanced", use "balanced", not "high protein")
 - Keep it simple when they ask for simple recipes
 
+USER REQUEST: {request}
+
 {agent_scratchpad}"""
 )
 
@@ -59,5 +66,14 @@ def generate_ingredient_plan(request: str) -> Plan:
     """
     Generate a meal plan based on ingredient request using LLM agent with MCP tools
     """
-    agent_executor = create_agent_executor(INGREDIENT_PLANNER_PROMPT, temperature=0.7, max_iterations=20)
+    agent_executor = create_agent_executor(INGREDIENT_PLANNER_PROMPT, temperature=0.7, max_iterations=8)
     return run_agent_with_parsing(agent_executor, {"request": request}, Plan)
+
+
+async def generate_ingredient_plan_async(request: str) -> Plan:
+    """
+    Async version of generate_ingredient_plan that runs tool calls on the caller's event loop
+    instead of re-entering it through a nested asyncio.run per call.
+    """
+    agent_executor = create_agent_executor(INGREDIENT_PLANNER_PROMPT, temperature=0.7, max_iterations=8)
+    return await run_agent_with_parsing_async(agent_executor, {"request": request}, Plan)
@@ -3,38 +3,44 @@ Centralized LLM configuration and initialization
 """
 
 from langchain_openai import ChatOpenAI, OpenAI
-from typing import Optional
+from typing import Dict
 
-# Global LLM instances
-_chat_llm: Optional[ChatOpenAI] = None
-_completion_llm: Optional[OpenAI] = None
+# Model used for every chat and completion call
+LLM_MODEL = "gpt-4o-mini"
+
+# Global LLM instances, one per temperature so callers using different
+# temperatures don't keep tearing down each other's client/connection pool
+_chat_llms: Dict[float, ChatOpenAI] = {}
+_completion_llms: Dict[float, OpenAI] = {}
 
 def get_chat_llm(temperature: float = 0.1) -> ChatOpenAI:
     """Get shared ChatOpenAI instance"""
-    global _chat_llm
-    if _chat_llm is None or _chat_llm.temperature != temperature:
-        _chat_llm = ChatOpenAI(
-            model="gpt-4o-mini",
+    key = round(temperature, 3)
+    llm = _chat_llms.get(key)
+    if llm is None:
+        llm = _chat_llms[key] = ChatOpenAI(
+            model=LLM_MODEL,
             temperature=temperature,
             max_tokens=2000,
             timeout=30,
         )
-    return _chat_llm
+    return llm
 
 def get_completion_llm(temperature: float = 0.1) -> OpenAI:
     """Get shared OpenAI completion instance"""
-    global _completion_llm
-    if _completion_llm is None or _completion_llm.temperature != temperature:
-        _completion_llm = OpenAI(
-            model="gpt-4o-mini",
+    key = round(temperature, 3)
+    llm = _completion_llms.get(key)
+    if llm is None:
+        llm = _completion_llms[key] = OpenAI(
+            model=LLM_MODEL,
             temperature=temperature,
             max_tokens=2000,
             timeout=30,
         )
-    return _completion_llm
+    return llm
 
 def set_temperature(temperature: float):
     """Update temperature for all LLM instances"""
-    global _chat_llm, _completion_llm
-    _chat_llm = None  # Force recreation with new temperature
-    _completion_llm = None
\ No newline at end of file
+    # Force recreation on next use
+    _chat_llms.clear()
+    _completion_llms.clear()
\ No newline at end of file
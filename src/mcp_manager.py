@@ -0,0 +1,169 @@
+"""
+Shared MCP client lifecycle management
+"""
+
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from nutrition_mcp.mcp_client import AsyncNutritionMCPClient
+from typing import Any, AsyncIterator, Coroutine, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class MCPClientManager:
+    """Singleton manager for async MCP client"""
+    
+    _instance = None
+    _client: Optional[AsyncNutritionMCPClient] = None
+    # Loop that started _client; sync tool calls from other threads are sent there
+    _client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    # asyncio locks belong to one event loop, so each loop gets its own start lock
+    _start_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+    
+    # Event loop running in a daemon thread, for synchronous tool calls made while
+    # no other loop owns a running client (see run_sync). A client's pipes and reader
+    # task are tied to the loop that started it, so this loop has its own client
+    _sync_loop: Optional[asyncio.AbstractEventLoop] = None
+    _sync_loop_lock = threading.Lock()
+    _sync_client: Optional[AsyncNutritionMCPClient] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    @classmethod
+    def _start_lock(cls) -> asyncio.Lock:
+        """Start lock for the running event loop"""
+        loop = asyncio.get_running_loop()
+        lock = cls._start_locks.get(loop)
+        if lock is None:
+            lock = cls._start_locks[loop] = asyncio.Lock()
+        return lock
+    
+    @staticmethod
+    async def _running(client: Optional[AsyncNutritionMCPClient]) -> AsyncNutritionMCPClient:
+        """Return the client if its server is running, otherwise a freshly started replacement"""
+        if client is not None and client.is_running():
+            return client
+        if client is not None:
+            # The server process died - clean up before replacing it
+            await client.stop_server()
+        
+        client = AsyncNutritionMCPClient()
+        await client.start_server()
+        return client
+    
+    @classmethod
+    async def start_server(cls):
+        """Start MCP server and client (no-op while one is already running)"""
+        # Concurrent callers share one server process instead of each spawning one
+        async with cls._start_lock():
+            client = await cls._running(cls._client)
+            if client is not cls._client:
+                cls._client, cls._client_loop = client, asyncio.get_running_loop()
+    
+    @classmethod
+    async def _start_sync_client(cls):
+        """Start (or restart) the background loop's own client - must run on that loop"""
+        async with cls._start_lock():
+            cls._sync_client = await cls._running(cls._sync_client)
+    
+    @classmethod
+    async def ensure_client(cls) -> AsyncNutritionMCPClient:
+        """Get the MCP client for the current event loop, starting (or restarting) the server if needed"""
+        if cls._on_sync_loop():
+            await cls._start_sync_client()
+        else:
+            await cls.start_server()
+        return cls.get_client()
+    
+    @classmethod
+    async def stop_server(cls):
+        """Stop MCP server and client, including the one serving synchronous tool calls"""
+        if cls._client is not None:
+            client, cls._client, cls._client_loop = cls._client, None, None
+            await client.stop_server()
+        if cls._sync_client is not None:
+            client, cls._sync_client = cls._sync_client, None
+            # Stopped on its own loop, without blocking this one
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.stop_server(), cls._sync_loop))
+    
+    @classmethod
+    @asynccontextmanager
+    async def session(cls) -> AsyncIterator[AsyncNutritionMCPClient]:
+        """Keep one MCP server running for everything inside the block"""
+        await cls.start_server()
+        try:
+            yield cls.get_client()
+        finally:
+            await cls.stop_server()
+    
+    @classmethod
+    def run_sync(cls, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        Run a coroutine from synchronous code and wait for its result
+        
+        Sync tool calls usually come from a worker thread while an async session
+        runs on another loop; they are sent to that loop so they share its client
+        (and its in-process server and nutrition database) rather than loading a
+        second copy. Called from that loop's own thread, or with no client
+        running, the coroutine runs on a background loop that is started on
+        first use and kept for the life of the process, and get_client() inside
+        it returns the background loop's own client.
+        """
+        loop = cls._client_loop
+        if loop is not None and loop.is_running() and not cls._on_loop(loop):
+            async def with_client() -> T:
+                try:
+                    await cls.start_server()
+                except BaseException:
+                    coro.close()
+                    raise
+                return await coro
+            
+            return asyncio.run_coroutine_threadsafe(with_client(), loop).result()
+        
+        with cls._sync_loop_lock:
+            if cls._sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mcp-tools-loop", daemon=True).start()
+                cls._sync_loop = loop
+        
+        if cls._on_sync_loop():
+            coro.close()
+            raise RuntimeError("run_sync() would deadlock when called from the background loop itself")
+        
+        async def with_sync_client() -> T:
+            try:
+                await cls._start_sync_client()
+            except BaseException:
+                coro.close()
+                raise
+            return await coro
+        
+        return asyncio.run_coroutine_threadsafe(with_sync_client(), cls._sync_loop).result()
+    
+    @staticmethod
+    def _on_loop(loop: asyncio.AbstractEventLoop) -> bool:
+        """Whether the caller is running on the given event loop"""
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+    
+    @classmethod
+    def _on_sync_loop(cls) -> bool:
+        """Whether the caller is running on the background loop used by run_sync()"""
+        return cls._on_loop(cls._sync_loop)
+    
+    @classmethod
+    def get_client(cls) -> AsyncNutritionMCPClient:
+        """Get the running MCP client for the current event loop"""
+        client = cls._sync_client if cls._on_sync_loop() else cls._client
+        if client is None:
+            raise RuntimeError("MCP client not started. Call start_server() first.")
+        return client
@@ -2,50 +2,69 @@
 MCP wrapper for nutrition tools
 """
 
-import json
-import asyncio
-from nutrition_mcp.mcp_client import AsyncNutritionMCPClient
+from contextlib import contextmanager
+from contextvars import ContextVar
 from langchain.tools import BaseTool
-from typing import Any, Dict, List, Optional
-import nest_asyncio
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import orjson
 
+# Re-exported: the manager lives in its own module so nutrition code can use it
+# without importing LangChain
+from src.mcp_manager import MCPClientManager
 
-class MCPClientManager:
-    """Singleton manager for async MCP client"""
-    
-    _instance = None
-    _client: Optional[AsyncNutritionMCPClient] = None
-    _nest_asyncio_applied = False
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-    
-    @classmethod
-    async def start_server(cls):
-        """Start MCP server and client"""
-        if not cls._nest_asyncio_applied:
-            nest_asyncio.apply()
-            cls._nest_asyncio_applied = True
-            
-        if cls._client is None:
-            cls._client = AsyncNutritionMCPClient()
-            await cls._client.start_server()
-    
-    @classmethod
-    async def stop_server(cls):
-        """Stop MCP server and client"""
-        if cls._client is not None:
-            await cls._client.stop_server()
-            cls._client = None
-    
-    @classmethod
-    def get_client(cls) -> AsyncNutritionMCPClient:
-        """Get the running MCP client"""
-        if cls._client is None:
-            raise RuntimeError("MCP client not started. Call start_server() first.")
-        return cls._client
+# Results of tool calls made inside the current tool_call_memo() block, keyed by
+# (tool name, canonical JSON arguments). Context-local so concurrent agent runs
+# don't share entries
+_tool_call_memo: ContextVar[Optional[Dict[Tuple[str, bytes], Any]]] = ContextVar("tool_call_memo", default=None)
+
+
+@contextmanager
+def tool_call_memo() -> Iterator[None]:
+    """Answer repeated identical tool calls inside the block (e.g. one agent run) from memory"""
+    token = _tool_call_memo.set({})
+    try:
+        yield
+    finally:
+        _tool_call_memo.reset(token)
+
+
+def _memo_key(tool_name: str, arguments: Dict) -> Tuple[str, bytes]:
+    """Memo key for a tool call, independent of argument order"""
+    return tool_name, orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS)
+
+
+async def _call_tool(tool_name: str, arguments: Dict) -> Any:
+    """Call an MCP tool on the shared client, reusing the result of an identical earlier call"""
+    memo = _tool_call_memo.get()
+    key = _memo_key(tool_name, arguments)
+    if memo is not None and key in memo:
+        return memo[key]
+    
+    result = await MCPClientManager.get_client().call_tool(tool_name, arguments)
+    if memo is not None:
+        memo[key] = result
+    return result
+
+
+async def _call_tools(calls: List[Tuple[str, Dict]]) -> List[Any]:
+    """Call several MCP tools in one round trip, skipping any answered by an identical earlier call"""
+    memo = _tool_call_memo.get()
+    if memo is None:
+        memo = {}
+    
+    keys = [_memo_key(tool_name, arguments) for tool_name, arguments in calls]
+    misses = {key: call for key, call in zip(keys, calls) if key not in memo}
+    if misses:
+        results = await MCPClientManager.get_client().call_tools(list(misses.values()))
+        memo.update(zip(misses, results))
+    return [memo[key] for key in keys]
+
+
+def _coerce_params(tool_input: Any) -> Any:
+    """Decode a tool input the agent passed as JSON text; structured input is used as-is"""
+    if isinstance(tool_input, (str, bytes)):
+        return orjson.loads(tool_input)
+    return tool_input
 
 
 class FindIngredientTool(BaseTool):
@@ -56,27 +75,58 @@ class FindIngredientTool(BaseTool):
     
     def _run(self, tool_input) -> str:
         """Find ingredient nutrition data"""
+        return MCPClientManager.run_sync(self._arun(tool_input))
+    
+    async def _arun(self, tool_input) -> str:
+        """Find ingredient nutrition data without leaving the running event loop"""
         try:
-            if isinstance(tool_input, str):
-                params = json.loads(tool_input)
-            else:
-                params = tool_input
+            params = _coerce_params(tool_input)
             
             ingredient_name = params.get("ingredient_name")
             max_results = params.get("max_results", 5)
             
-            return asyncio.run(self._find_ingredient_async(ingredient_name, max_results))
+            return await self._find_ingredient_async(ingredient_name, max_results)
         except Exception as e:
             return f"Error finding ingredient: {str(e)}"
     
     async def _find_ingredient_async(self, ingredient_name: str, max_results: int) -> str:
         """Async implementation for finding ingredient nutrition data"""
-        client = MCPClientManager.get_client()
-        result = await client.call_tool(
-            "find_ingredient", 
+        result = await _call_tool(
+            "find_ingredient",
             {"ingredient_name": ingredient_name, "max_results": max_results}
         )
-        return str(result)
+        return orjson.dumps(result).decode()
+
+
+class FindIngredientsBatchTool(BaseTool):
+    """Tool to find nutrition data for several ingredients in one call"""
+    
+    name: str = "find_ingredients"
+    description: str = "Find nutrition data for several ingredients at once using fuzzy matching. Input should be ingredient_names (a list) and optional max_results. Returns matches for each ingredient."
+    
+    def _run(self, tool_input) -> str:
+        """Find nutrition data for several ingredients"""
+        return MCPClientManager.run_sync(self._arun(tool_input))
+    
+    async def _arun(self, tool_input) -> str:
+        """Find nutrition data for several ingredients without leaving the running event loop"""
+        try:
+            params = _coerce_params(tool_input)
+            
+            ingredient_names = params.get("ingredient_names", [])
+            max_results = params.get("max_results", 5)
+            
+            return await self._find_ingredients_async(ingredient_names, max_results)
+        except Exception as e:
+            return f"Error finding ingredients: {str(e)}"
+    
+    async def _find_ingredients_async(self, ingredient_names: List[str], max_results: int) -> str:
+        """Async implementation looking up every ingredient in one MCP round trip"""
+        results = await _call_tools([
+            ("find_ingredient", {"ingredient_name": name, "max_results": max_results})
+            for name in ingredient_names
+        ])
+        return orjson.dumps(dict(zip(ingredient_names, results))).decode()
 
 
 class CalculateRecipeNutritionTool(BaseTool):
@@ -87,37 +137,28 @@ class CalculateRecipeNutritionTool(BaseTool):
     
     def _run(self, tool_input) -> str:
         """Calculate recipe nutrition"""
+        return MCPClientManager.run_sync(self._arun(tool_input))
+    
+    async def _arun(self, tool_input) -> str:
+        """Calculate recipe nutrition without leaving the running event loop"""
         try:
-            if isinstance(tool_input, str):
-                try:
-                    params = json.loads(tool_input)
-                    if isinstance(params, list):
-                        ingredients_data = params
-                    else:
-                        ingredients_data = params.get("ingredients", params)
-                except json.JSONDecodeError:
-                    ingredients_data = tool_input
-            else:
-                if isinstance(tool_input, list):
-                    ingredients_data = tool_input
-                else:
-                    ingredients_data = tool_input.get("ingredients", tool_input)
+            params = _coerce_params(tool_input)
+            ingredients_data = params if isinstance(params, list) else params.get("ingredients", params)
+            
+            # The ingredient list itself may arrive as a JSON string
+            ingredients_data = _coerce_params(ingredients_data)
             
-            if isinstance(ingredients_data, str):
-                ingredients_data = json.loads(ingredients_data)
-                
-            return asyncio.run(self._calculate_nutrition_async(ingredients_data))
+            return await self._calculate_nutrition_async(ingredients_data)
         except Exception as e:
             return f"Error calculating recipe nutrition: {str(e)}"
     
     async def _calculate_nutrition_async(self, ingredients_data: list) -> str:
         """Async implementation for calculating recipe nutrition"""
-        client = MCPClientManager.get_client()
-        result = await client.call_tool(
+        result = await _call_tool(
             "calculate_recipe_nutrition",
             {"ingredients": ingredients_data}
         )
-        return str(result)
+        return orjson.dumps(result).decode()
 
 
 class GetHighProteinFoodsTool(BaseTool):
@@ -128,26 +169,26 @@ class GetHighProteinFoodsTool(BaseTool):
     
     def _run(self, tool_input) -> str:
         """Get high protein foods"""
+        return MCPClientManager.run_sync(self._arun(tool_input))
+    
+    async def _arun(self, tool_input) -> str:
+        """Get high protein foods without leaving the running event loop"""
         try:
-            if isinstance(tool_input, str):
-                params = json.loads(tool_input)
-            else:
-                params = tool_input
+            params = _coerce_params(tool_input)
             
             min_protein = params.get("min_protein", 20.0)
             
-            return asyncio.run(self._get_high_protein_async(min_protein))
+            return await self._get_high_protein_async(min_protein)
         except Exception as e:
             return f"Error getting high protein foods: {str(e)}"
     
     async def _get_high_protein_async(self, min_protein: float) -> str:
         """Async implementation for getting high protein foods"""
-        client = MCPClientManager.get_client()
-        result = await client.call_tool(
+        result = await _call_tool(
             "get_high_protein_foods",
             {"min_protein": min_protein}
         )
-        return str(result)
+        return orjson.dumps(result).decode()
 
 
 class SearchIngredientsTool(BaseTool):
@@ -158,32 +199,33 @@ class SearchIngredientsTool(BaseTool):
     
     def _run(self, tool_input) -> str:
         """Search ingredients by description"""
+        return MCPClientManager.run_sync(self._arun(tool_input))
+    
+    async def _arun(self, tool_input) -> str:
+        """Search ingredients by description without leaving the running event loop"""
         try:
-            if isinstance(tool_input, str):
-                params = json.loads(tool_input)
-            else:
-                params = tool_input
+            params = _coerce_params(tool_input)
             
             description = params.get("description")
             
-            return asyncio.run(self._search_ingredients_async(description))
+            return await self._search_ingredients_async(description)
         except Exception as e:
             return f"Error searching ingredients: {str(e)}"
     
     async def _search_ingredients_async(self, description: str) -> str:
         """Async implementation for searching ingredients by description"""
-        client = MCPClientManager.get_client()
-        result = await client.call_tool(
+        result = await _call_tool(
             "search_ingredients",
             {"description": description}
         )
-        return str(result)
+        return orjson.dumps(result).decode()
 
 
 def get_nutrition_tools():
     """Get all nutrition tools for LangChain agents"""
     return [
         FindIngredientTool(),
+        FindIngredientsBatchTool(),
         CalculateRecipeNutritionTool(),
         GetHighProteinFoodsTool(),
         SearchIngredientsTool()
@@ -2,19 +2,120 @@
 Nutrition calculation using MCP server
 """
 
+import asyncio
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import orjson
+
 from src.models import Recipe, NutritionProfile
-from src.mcp_tools import MCPClientManager
+from src.mcp_manager import MCPClientManager
+from utils.disk_cache import DiskCache
+
+NUTRITION_MEMORY_CACHE_SIZE = 1024
+# Unset by default: foods added to the database can change matches, and stored
+# totals would not see them. Set it to share results across runs.
+NUTRITION_CACHE_DIR = os.environ.get("NUTRITION_CACHE_DIR")
+NUTRITION_CACHE_TTL = 86400  # seconds
+
+_memory_cache: Dict[str, NutritionProfile] = {}
+_disk_cache: Optional[DiskCache] = DiskCache(NUTRITION_CACHE_DIR) if NUTRITION_CACHE_DIR else None
+
+def _nutrition_cache_key(recipe: Recipe) -> str:
+    """Content hash of the parts of a Recipe that determine its nutrition"""
+    # Totals are order-independent sums and the server matches names
+    # case-insensitively, so normalize both to share entries across recipes
+    ingredients = orjson.dumps(sorted(
+        [ingredient.item.strip().lower(), ingredient.qty.strip()] for ingredient in recipe.ingredients
+    ))
+    return hashlib.blake2b(ingredients, digest_size=16).hexdigest()
+
+def _get_cached_nutrition(key: str) -> Optional[NutritionProfile]:
+    """Look up a profile in the process-local cache, then on disk"""
+    nutrition = _memory_cache.pop(key, None)
+    if nutrition is not None:
+        # Re-insert so the dict stays ordered from least to most recently used
+        _memory_cache[key] = nutrition
+    elif _disk_cache is not None:
+        cached = _disk_cache.get(key)
+        if cached:
+            nutrition = NutritionProfile.model_validate_json(cached)
+            _remember(key, nutrition)
+    return nutrition
+
+def _remember(key: str, nutrition: NutritionProfile) -> None:
+    """Add a profile to the process-local cache, evicting the least recently used entry when full"""
+    if len(_memory_cache) >= NUTRITION_MEMORY_CACHE_SIZE:
+        _memory_cache.pop(next(iter(_memory_cache)))
+    _memory_cache[key] = nutrition
 
 async def compute_nutrition(recipe: Recipe) -> NutritionProfile:
     """Calculate nutrition using MCP server"""
-    client = MCPClientManager.get_client()
-    result = await client.calculate_recipe_nutrition(recipe)
+    return (await compute_nutrition_batch([recipe]))[0]
+
+async def compute_nutrition_batch(recipes: List[Recipe]) -> List[NutritionProfile]:
+    """
+    Calculate nutrition for several recipes with at most one MCP round-trip
+    
+    Args:
+        recipes: Recipes to analyze
+        
+    Returns:
+        Nutrition profiles in the same order as recipes
+    """
+    # Recipes with identical ingredients skip the MCP round-trip
+    keys = [_nutrition_cache_key(recipe) for recipe in recipes]
+    profiles = {}
+    missing = {}
+    for key, recipe in zip(keys, recipes):
+        cached = _get_cached_nutrition(key)
+        if cached is not None:
+            profiles[key] = cached
+        else:
+            missing.setdefault(key, recipe)
+    
+    if missing:
+        # Reuse the long-lived MCP server, starting it on first use
+        client = await MCPClientManager.ensure_client()
+        result = await client.calculate_recipes_nutrition(list(missing.values()))
+        
+        if "error" in result:
+            raise ValueError(f"MCP nutrition calculation failed: {result['error']}")
+        
+        for key, recipe_result in zip(missing, result["recipes"]):
+            nutrition = _to_nutrition_profile(recipe_result.get("recipe_nutrition", {}))
+            _remember(key, nutrition)
+            if _disk_cache is not None:
+                _disk_cache.set(key, nutrition.model_dump_json(), expire=NUTRITION_CACHE_TTL)
+            profiles[key] = nutrition
     
-    if "error" in result:
-        raise ValueError(f"MCP nutrition calculation failed: {result['error']}")
+    return [profiles[key].model_copy(deep=True) for key in keys]
+
+async def compute_nutrition_many(recipes: List[Recipe], batch_size: int = 10, max_concurrency: int = 4) -> List[NutritionProfile]:
+    """
+    Calculate nutrition for many recipes as several concurrent batches
+    
+    Args:
+        recipes: Recipes to analyze
+        batch_size: Recipes sent per MCP request
+        max_concurrency: Maximum number of MCP requests in flight at once
+        
+    Returns:
+        Nutrition profiles in the same order as recipes
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
     
-    recipe_nutrition = result.get("recipe_nutrition", {})
+    async def compute(batch: List[Recipe]) -> List[NutritionProfile]:
+        async with semaphore:
+            return await compute_nutrition_batch(batch)
     
+    batches = [recipes[i:i + batch_size] for i in range(0, len(recipes), batch_size)]
+    results = await asyncio.gather(*(compute(batch) for batch in batches))
+    return [profile for batch_profiles in results for profile in batch_profiles]
+
+def _to_nutrition_profile(recipe_nutrition: Dict[str, float]) -> NutritionProfile:
+    """Build a NutritionProfile from the MCP server's recipe totals"""
     nutrition_data = {
         "calories": recipe_nutrition.get("calories", 0.0),
         "macros": {
@@ -43,6 +144,8 @@ async def compute_nutrition(recipe: Recipe) -> NutritionProfile:
         }
     }
     
-    return NutritionProfile.model_validate(nutrition_data)
+    # Values come from our own MCP server, which always reports float totals
+    # for every nutrient, so skip re-validating the structure we just built
+    return NutritionProfile.model_construct(**nutrition_data)
 
 
@@ -1,22 +1,55 @@
 
-from json import JSONDecoder, JSONDecodeError
-import re
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
 from langchain.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
 from pydantic import ValidationError
 
 from src.models import UserNeeds, Plan
-from src.llm_config import get_completion_llm
+from src.llm_config import LLM_MODEL, get_chat_llm
+from utils.prompt_cache import prompt_cache
+
+PLANNER_MAX_TOKENS = 600
+
+# Strict structured-output schema for Plan. Strict mode requires every property
+# to be listed as required, so the optional dietary_needs is nullable instead
+PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "Plan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "meal": {"type": "string"},
+                "ingredients": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "item": {"type": "string"},
+                            "qty": {"type": "string"}
+                        },
+                        "required": ["item", "qty"],
+                        "additionalProperties": False
+                    }
+                },
+                "dietary_needs": {"type": ["string", "null"]}
+            },
+            "required": ["meal", "ingredients", "dietary_needs"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Constraints go last so every request shares the same leading tokens,
+# which is what OpenAI's automatic prompt caching matches on
 prompt = PromptTemplate(
     input_variables=["cuisine", "max_prep_time", "dietary_needs"],
     template="""
 You are a CREATIVE meal planner. Generate DIVERSE meals - avoid repetition!
 
-User Constraints:
-- Cuisine: {cuisine}
-- Max prep time: {max_prep_time} minutes
-- Dietary needs: {dietary_needs}
-
 VARIETY IS KEY! Consider diverse options:
 - Indian: biryani, dosa, samosas, different regional curries, street food, paneer dishes
 - For any cuisine: think beyond the obvious - be creative with ingredients and techniques!
@@ -35,41 +68,79 @@ Produce exactly one JSON object, and nothing else, like:
 IMPORTANT: If dietary needs are specified (e.g., vegan, vegetarian), ensure the meal and ingredients comply with those restrictions.
 
 Do NOT include any examples, explanation, or additional JSON objects—output only that one JSON.
+
+User Constraints:
+- Cuisine: {cuisine}
+- Max prep time: {max_prep_time} minutes
+- Dietary needs: {dietary_needs}
 """,
 )
 
-# Chain created dynamically with higher temperature for creativity
-def get_planner_chain():
-    return prompt | get_completion_llm(temperature=1.2)
-
-def generate_plan(constraints: UserNeeds) -> Plan:
-    # 1. Invoke LLM with higher temperature for creativity
-    raw = get_planner_chain().invoke({
-        "cuisine": constraints.cuisine,
-        "max_prep_time": constraints.max_prep_time,
-        "dietary_needs": constraints.dietary_needs
-    })
+# Bound planner LLM, kept with the shared LLM it wraps so a set_temperature() reset is noticed
+_planner_llm: Optional[Tuple[Any, Runnable]] = None
 
+# Planner sampling temperature - high for creative variety
+PLANNER_TEMPERATURE = 1.2
 
-    # Remove code blocks and extract JSON
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw).strip()
+# LLM bound with higher temperature for creativity
+def get_planner_llm() -> Runnable:
+    global _planner_llm
+    llm = get_chat_llm(temperature=PLANNER_TEMPERATURE)
+    if _planner_llm is not None and _planner_llm[0] is llm:
+        return _planner_llm[1]
     
-    # Extract JSON object from response (handle extra text from higher temperature)
-    json_match = re.search(r'\{.*\}', raw, re.DOTALL)
-    if json_match:
-        raw = json_match.group(0)
-
-
-    decoder = JSONDecoder()
+    # A Plan is a short JSON object - cap the completion so a rambling model can't run long.
+    # Structured outputs constrain decoding to PLAN_RESPONSE_FORMAT, so the reply
+    # is always a bare, schema-shaped object with no fences or commentary.
+    bound = llm.bind(
+        response_format=PLAN_RESPONSE_FORMAT,
+        max_tokens=PLANNER_MAX_TOKENS,
+    )
+    _planner_llm = (llm, bound)
+    return bound
+
+def _format_planner_prompt(constraints: UserNeeds) -> str:
+    # The prompt is plain string substitution - format it directly rather than
+    # running it as its own step of a Runnable pipeline
+    return prompt.format(
+        cuisine=constraints.cuisine,
+        max_prep_time=constraints.max_prep_time,
+        dietary_needs=constraints.dietary_needs
+    )
+
+def _parse_plan(raw_output: str) -> Plan:
+    # Only a reply cut off at the token cap (or a refusal) can fail to parse
     try:
-        data: Dict[str, Any]
-        data, _ = decoder.raw_decode(raw)
-    except JSONDecodeError:
-        raise ValueError(f"Could not parse JSON from planner output:\n{raw}")
-
+        data: Dict[str, Any] = orjson.loads(raw_output)
+    except orjson.JSONDecodeError:
+        raise ValueError(f"Could not parse JSON from planner output:\n{raw_output.strip()}")
 
     try:
         return Plan.model_validate(data)
     except ValidationError as e:
         raise ValueError(f"Planner output did not match Plan schema:\n{e}")
+
+def _planner_settings(prompt_text: str) -> Tuple[str, float]:
+    """Model and temperature the planner sends a prompt with"""
+    return LLM_MODEL, PLANNER_TEMPERATURE
+
+# Only the LLM call is cached - parsing runs fresh on every hit
+@prompt_cache(lambda prompt_text: prompt_text, _planner_settings)
+def _call_planner(prompt_text: str) -> str:
+    return get_planner_llm().invoke(prompt_text).content
+
+@prompt_cache(lambda prompt_text: prompt_text, _planner_settings)
+async def _call_planner_async(prompt_text: str) -> str:
+    return (await get_planner_llm().ainvoke(prompt_text)).content
+
+def generate_plan(constraints: UserNeeds) -> Plan:
+    # Call the LLM with higher temperature for creativity
+    raw_output = _call_planner(_format_planner_prompt(constraints))
+    return _parse_plan(raw_output)
+
+async def generate_plan_async(constraints: UserNeeds) -> Plan:
+    """
+    Async version of generate_plan that doesn't block the event loop during the LLM call.
+    """
+    raw_output = await _call_planner_async(_format_planner_prompt(constraints))
+    return _parse_plan(raw_output)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test parsing of agent output into models
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.agent_utils import parse_json_response
+from src.models import Plan
+
+def test_parse_json_response():
+    """Test that JSON after the last Final Answer is parsed and validated"""
+    raw = ('Thought: draft {"meal": "wrong"}\nFinal Answer: Here it is '
+           '{"meal": "Dal", "ingredients": [{"item": "lentils", "qty": "200g"}], "dietary_needs": "vegan"} done')
+    plan = parse_json_response(raw, Plan)
+    assert plan.meal == "Dal"
+    assert plan.ingredients[0].item == "lentils"
+
+    trailing = 'Final Answer: {"meal": "Dal {v2}", "ingredients": []} (see {notes})'
+    assert parse_json_response(trailing, Plan).meal == "Dal {v2}"
+
+    with pytest.raises(ValueError, match="No JSON found"):
+        parse_json_response("Final Answer: nothing here", Plan)
+    with pytest.raises(ValueError, match="Failed to parse"):
+        parse_json_response('{"meal": }', Plan)
+
+def test_create_agent_executor_reused(monkeypatch):
+    """Test that executors are shared per prompt and settings, and rebuilt when the LLM changes"""
+    from langchain.prompts import PromptTemplate
+    from langchain_core.language_models.fake import FakeListLLM
+    from src import agent_utils
+
+    llms = {}
+    monkeypatch.setattr(agent_utils, "get_completion_llm",
+                        lambda temperature: llms.setdefault(temperature, FakeListLLM(responses=["Final Answer: {}"])))
+    monkeypatch.setattr(agent_utils, "_AGENT_CACHE", {})
+    prompt = PromptTemplate.from_template("{input} {tools} {tool_names} {agent_scratchpad}")
+
+    first = agent_utils.create_agent_executor(prompt, temperature=0.7)
+    assert agent_utils.create_agent_executor(prompt, temperature=0.7) is first
+    assert agent_utils.create_agent_executor(prompt, temperature=0.7, max_iterations=3) is not first
+    other_tools = agent_utils.create_agent_executor(prompt, temperature=0.2).tools
+    assert all(a is b for a, b in zip(first.tools, other_tools))
+
+    llms.clear()
+    assert agent_utils.create_agent_executor(prompt, temperature=0.7) is not first
+
+def test_loop_guard_stops_repeated_actions():
+    """Test that a repeated action is answered with a warning and a second repeat stops the agent"""
+    from langchain.agents import create_react_agent
+    from langchain.prompts import PromptTemplate
+    from langchain_core.language_models.fake import FakeListLLM
+    from langchain_core.tools import Tool
+    from src.agent_utils import LoopGuardAgentExecutor, REPEATED_ACTION_OBSERVATION
+
+    def run(responses):
+        calls = []
+        tool = Tool(name="lookup", func=lambda query: calls.append(query) or f"found {query}", description="Look up")
+        prompt = PromptTemplate.from_template("{input} {tools} {tool_names} {agent_scratchpad}")
+        agent = create_react_agent(FakeListLLM(responses=responses), [tool], prompt)
+        executor = LoopGuardAgentExecutor(agent=agent, tools=[tool], max_iterations=8, return_intermediate_steps=True)
+        return executor.invoke({"input": "go"}), calls
+
+    lookup = 'Thought: check\nAction: lookup\nAction Input: {"name": "potato", "max": 3}'
+    reordered = 'Thought: again\nAction: lookup\nAction Input: {"max": 3, "name": "potato"}'
+
+    result, calls = run([lookup, reordered, "Final Answer: done"])
+    assert result["output"] == "done"
+    assert [obs for _, obs in result["intermediate_steps"]] == ['found {"name": "potato", "max": 3}', REPEATED_ACTION_OBSERVATION]
+
+    result, calls = run([lookup, lookup, lookup, "Final Answer: never reached"])
+    assert result["output"].startswith("Agent stopped")
+    assert len(result["intermediate_steps"]) == 2
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test chef chain construction
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from langchain_openai import ChatOpenAI, OpenAI
+
+from src import chef
+from src.models import Ingredient, Plan
+
+def test_chef_chains_reused(monkeypatch):
+    """Test that chains are built once per temperature and rebuilt when the shared LLM changes"""
+    chat_llms = {}
+    monkeypatch.setattr(chef, "get_chat_llm",
+                        lambda temperature: chat_llms.setdefault(temperature, ChatOpenAI(api_key="test")))
+    monkeypatch.setattr(chef, "get_completion_llm", lambda temperature: OpenAI(api_key="test"))
+    monkeypatch.setattr(chef, "_CHAIN_CACHE", {})
+
+    chain = chef.get_chef_chain()
+    assert chef.get_chef_chain() is chain
+    assert chef.get_chef_chain(0.0) is not chain
+
+    chat_llms.clear()
+    assert chef.get_chef_chain() is not chain
+
+    # A fresh completion LLM every call means the nutrition chain is never stale
+    assert chef.get_nutrition_chef_chain() is not chef.get_nutrition_chef_chain()
+
+async def test_large_nutrition_aware_output_parsed_in_thread(monkeypatch):
+    """Test that only responses over the threshold are parsed off the event loop"""
+    recipe_json = ('{"title": "Dal", "prep_time": 10, "cook_time": 20, "servings": 2, '
+                   '"ingredients": [{"item": "lentils", "qty": "200g"}], "steps": ["Simmer"]}')
+    threaded = []
+
+    async def fake_to_thread(func, *args):
+        threaded.append(func)
+        return func(*args)
+
+    monkeypatch.setattr(chef.asyncio, "to_thread", fake_to_thread)
+    plan = Plan(meal="Dal", ingredients=[Ingredient(item="lentils", qty="200g")])
+
+    async def short_response(plan_json, nutrition_goals):
+        return recipe_json
+
+    async def long_response(plan_json, nutrition_goals):
+        return recipe_json + " " * chef.THREADED_PARSE_MIN_CHARS
+
+    monkeypatch.setattr(chef, "_stream_nutrition_chef_async", short_response)
+    assert (await chef.generate_nutrition_aware_recipe_async(plan)).title == "Dal"
+    assert threaded == []
+
+    monkeypatch.setattr(chef, "_stream_nutrition_chef_async", long_response)
+    assert (await chef.generate_nutrition_aware_recipe_async(plan)).title == "Dal"
+    assert threaded == [chef._parse_nutrition_aware_recipe]
+
+def test_parse_nutrition_aware_recipe_shapes():
+    """Test bare JSON, fenced JSON and back-to-back objects all yield the first recipe"""
+    recipe_json = ('{"title": "Dal", "prep_time": 10, "cook_time": 20, "servings": 2, '
+                   '"ingredients": [{"item": "lentils", "qty": "200g"}], "steps": ["Simmer"]}')
+
+    assert chef._parse_nutrition_aware_recipe(f"  {recipe_json}\n").title == "Dal"
+    assert chef._parse_nutrition_aware_recipe(f"```json\n{recipe_json}\n```").title == "Dal"
+    assert chef._parse_nutrition_aware_recipe(f'{recipe_json}\n{{"note": "extra"}}').title == "Dal"
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test conversion of the source nutrition data to TinyDB format
+"""
+
+import sys
+import os
+
+import orjson
+from tinydb import TinyDB
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from database import convert_nutrition_data, OrjsonStorage
+
+SOURCE = os.path.join(project_root, "data", "complete_nutrition_database.json")
+
+def test_convert_writes_tinydb_layout(tmp_path):
+    """Test that streamed output loads in TinyDB with metadata and sequential ids"""
+    output = tmp_path / "out" / "nutrition.json"
+    assert convert_nutrition_data(SOURCE, str(output))
+
+    with open(SOURCE, 'rb') as f:
+        source = orjson.loads(f.read())
+    db = TinyDB(str(output), storage=OrjsonStorage)
+    foods = db.all()
+    assert len(foods) == len(source)
+    assert [food.doc_id for food in foods] == list(range(1, len(source) + 1))
+
+    first_id, first_doc = next(iter(source.items()))
+    assert foods[0] == {**first_doc, 'food_id': first_id, 'source': 'usda', 'confidence': 1.0}
+    assert db.insert({'description': 'new'}) == len(source) + 1
+    db.close()
+
+def test_convert_invalid_json_keeps_existing_output(tmp_path):
+    """Test that a parse error reports failure without touching the output file"""
+    source = tmp_path / "bad.json"
+    source.write_text('{"a": {"description": "x"}, ')
+    output = tmp_path / "nutrition.json"
+    output.write_text("existing")
+
+    assert not convert_nutrition_data(str(source), str(output))
+    assert output.read_text() == "existing"
+    assert not (tmp_path / "nutrition.json.tmp").exists()
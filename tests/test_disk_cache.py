@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test the file-backed DiskCache
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils.disk_cache import DiskCache
+
+def test_concurrent_writes_to_one_key(tmp_path):
+    """Test that concurrent writers of the same key each leave a complete entry"""
+    cache = DiskCache(str(tmp_path))
+    values = [str(i) * 1000 for i in range(32)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda value: cache.set("key", value), values))
+
+    assert cache.get("key") in values
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_prune_expired_and_oldest(tmp_path):
+    """Test that writes sweep expired entries and prune drops the oldest beyond max_entries"""
+    cache = DiskCache(str(tmp_path), max_entries=2)
+    cache.set("expired", "x", expire=-1)
+    assert not cache._path("expired").exists()
+
+    for age, key in enumerate(["c", "b", "a"]):
+        cache.set(key, key)
+        os.utime(cache._path(key), (time.time() - age * 10,) * 2)
+
+    assert cache.prune() == 1
+    assert cache.get("a") is None
+    assert [cache.get("b"), cache.get("c")] == ["b", "c"]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test fuzzy ingredient matching
+"""
+
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils import fuzzy_match
+from utils.fuzzy_match import FuzzyMatcher
+
+FOODS = [
+    {"food_id": "1", "description": "Milk, coconut, canned"},
+    {"food_id": "2", "description": "Milk, whole"},
+    {"food_id": "3", "description": "Coconut water"},
+    {"food_id": "4", "description": "Broccoli, raw"},
+]
+
+@pytest.fixture
+def matcher():
+    """FuzzyMatcher with the default test threshold"""
+    return FuzzyMatcher(min_confidence=0.3)
+
+def test_string_similarity(matcher):
+    """Test similarity bounds on identical, disjoint and partial matches"""
+    assert fuzzy_match.string_similarity("coconut milk", "coconut milk") == 1.0
+    assert fuzzy_match.string_similarity("abc", "xyz") == 0.0
+    assert fuzzy_match.string_similarity("", "") == 1.0
+    assert 0.0 < fuzzy_match.string_similarity("coconut milk", "milk coconut") < 1.0
+
+def test_find_best_matches_ranking(matcher):
+    """Test that word-order-independent matches rank first and weak ones are dropped"""
+    matches = matcher.find_best_matches("coconut milk", FOODS, limit=3)
+    assert matches[0]["description"] == "Milk, coconut, canned"
+    assert all(m["match_score"] >= 0.3 for m in matches)
+    assert "Broccoli, raw" not in [m["description"] for m in matches]
+    assert "match_score" not in FOODS[0]
+
+def test_batch_scores_match_pairwise(matcher):
+    """Test that batched scoring gives the same scores as calculate_match_score"""
+    matcher.min_confidence = 0.0
+    matches = matcher.find_best_matches("Coconut (canned) milk", FOODS, limit=len(FOODS))
+    assert len(matches) == len(FOODS)
+    for match in matches:
+        assert match["match_score"] == pytest.approx(
+            matcher.calculate_match_score("Coconut (canned) milk", match["description"]))
+
+def test_string_similarities_cutoff():
+    """Test that choices below the cutoff report 0.0 and the rest keep their similarity"""
+    choices = ["coconut milk", "coconut", "broccoli"]
+    full = fuzzy_match.string_similarities("coconut milk", choices)
+    cut = fuzzy_match.string_similarities("coconut milk", choices, score_cutoff=0.5)
+    assert full == pytest.approx([fuzzy_match.string_similarity("coconut milk", c) for c in choices])
+    assert cut[:2] == full[:2]
+    assert cut[2] == 0.0 < full[2]
+
+def test_word_score_repeated_words(matcher):
+    """Test that repeated ingredient words count once for overlap but each for key presence"""
+    def word_score(ingredient, description):
+        food_clean = fuzzy_match._normalize_text(description)
+        food_mask = matcher._food_mask(food_clean)
+        query = matcher._word_query(fuzzy_match._normalize_text(ingredient))
+        return matcher._word_score(query, food_clean, food_mask)
+
+    assert word_score("coconut milk", "Milk, coconut") == pytest.approx(0.7)
+    # One distinct word fully present, but only 2 of 3 words count towards key presence
+    assert word_score("tofu tofu silken", "Tofu, silken") == pytest.approx(0.7)
+    assert word_score("tofu tofu silken", "Silken cake") == pytest.approx(0.25)
+    assert word_score("raw", "Broccoli, raw") == 0.0
+
+def test_word_bits_come_from_food_words_only(matcher):
+    """Test that query words get no bits and concurrent matching never reuses a bit"""
+    foods = [{"food_id": str(i), "description": f"Food{i}a food{i}b, shared"} for i in range(400)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda chunk: matcher.find_best_matches("zzqx shared", chunk),
+                      [foods[i:i + 10] for i in range(0, len(foods), 10)]))
+
+    bits = list(matcher._word_bits.values())
+    assert len(bits) == 801
+    assert sorted(bits) == [1 << i for i in range(801)]
+    assert "zzqx" not in matcher._word_bits
+    assert matcher._word_query(fuzzy_match._normalize_text("zzqx")).word_mask == 0
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test JSON extraction from LLM output
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils.json_extract import IncrementalJsonParser, extract_first_json_object
+
+def test_extract_plain_object():
+    """Test extraction when output is already pure JSON"""
+    assert extract_first_json_object('{"a": 1}') == '{"a": 1}'
+
+def test_extract_ignores_surrounding_prose():
+    """Test extraction from fenced output with trailing commentary"""
+    raw = 'Here you go:\n```json\n{"title": "Soup", "steps": ["Boil"]}\n```\nEnjoy {not json}'
+    assert extract_first_json_object(raw) == '{"title": "Soup", "steps": ["Boil"]}'
+
+def test_extract_nested_and_string_braces():
+    """Test that nested objects and braces inside strings are balanced correctly"""
+    raw = '{"a": {"b": "}{"}, "c": "say \\"{hi}\\""} trailing }'
+    assert extract_first_json_object(raw) == '{"a": {"b": "}{"}, "c": "say \\"{hi}\\""}'
+
+def test_extract_missing_or_unbalanced():
+    """Test that missing or unterminated objects return None"""
+    assert extract_first_json_object("no json here") is None
+    assert extract_first_json_object('{"a": 1') is None
+
+def test_incremental_parser_across_chunks():
+    """Test that objects split mid-string and mid-escape are found once they close"""
+    chunks = ['Sure! ```json\n{"title": "A \\', '"quoted\\" }', ' title", "steps": [', '"Mix"]}', '\n``` extra']
+    parser = IncrementalJsonParser()
+    completed = [parser.push(chunk) for chunk in chunks]
+
+    assert completed == [False, False, False, True, True]
+    assert parser.result() == {"title": 'A "quoted" } title', "steps": ["Mix"]}
+    assert parser.received().startswith("Sure!")
+
+def test_incremental_parser_incomplete():
+    """Test that results are unavailable until the object closes"""
+    parser = IncrementalJsonParser()
+    parser.push('{"a": [1, 2')
+    assert not parser.is_complete()
+    assert parser.json_text() is None
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test batch request handling in main
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+from contextlib import asynccontextmanager
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import main
+
+async def test_run_all_overlaps_requests_and_keeps_order(monkeypatch, capsys):
+    """Test that batch requests run concurrently, bounded, and print in input order"""
+    running = 0
+    peak = 0
+
+    async def fake_run(args):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (10 - args.number))
+        running -= 1
+        return f"plan {args.number}", None, None
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    monkeypatch.setattr(main, "run_cuisine_mode", fake_run)
+    monkeypatch.setattr(main.MCPClientManager, "session", session)
+    monkeypatch.setattr(main, "print_output", lambda plan, recipe, nutrition: print(plan))
+
+    assert await main.run_all([argparse.Namespace(mode="cuisine", number=n) for n in range(8)]) == 0
+
+    assert peak == main.BATCH_CONCURRENCY
+    assert capsys.readouterr().out.split("\n")[:-1] == [f"plan {n}" for n in range(8)]
+
+async def test_run_all_reports_failures_and_keeps_other_results(monkeypatch, capsys):
+    """Test that a failed request is reported without losing the other results"""
+    async def fake_run(args):
+        if args.number == 1:
+            raise ValueError("no recipe")
+        return f"plan {args.number}", None, None
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    monkeypatch.setattr(main, "run_cuisine_mode", fake_run)
+    monkeypatch.setattr(main.MCPClientManager, "session", session)
+    monkeypatch.setattr(main, "print_output", lambda plan, recipe, nutrition: print(plan))
+
+    assert await main.run_all([argparse.Namespace(mode="cuisine", number=n) for n in range(3)]) == 1
+
+    captured = capsys.readouterr()
+    assert captured.out.split("\n")[:-1] == ["plan 0", "plan 2"]
+    assert captured.err == "Request 2 failed: no recipe\n"
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test MCP client process lifecycle
+"""
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from nutrition_mcp.mcp_client import AsyncNutritionMCPClient
+from src.models import Recipe, Ingredient
+
+async def test_stop_server_is_idempotent():
+    """Test that stopping twice, or stopping an exited process, is safe"""
+    client = AsyncNutritionMCPClient(transport="subprocess")
+    client.server_process = await asyncio.create_subprocess_exec(sys.executable, "-c", "import time; time.sleep(30)")
+    await client.stop_server()
+    await client.stop_server()
+    assert client.server_process is None
+
+    client.server_process = await asyncio.create_subprocess_exec(sys.executable, "-c", "pass")
+    await client.server_process.wait()
+    await client.stop_server()
+    assert client.server_process is None
+
+FAKE_SERVER = """
+import json, sys
+first = json.loads(sys.stdin.readline())
+second = json.loads(sys.stdin.readline())
+# Answer out of order, with a notification in between
+for request in (second, first):
+    print(json.dumps({"jsonrpc": "2.0", "method": "notifications/message"}))
+    print(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {"echo": request["params"]}}), flush=True)
+"""
+
+async def test_concurrent_requests_are_matched_by_id():
+    """Test that responses arriving out of order reach the right caller"""
+    client = AsyncNutritionMCPClient(transport="subprocess")
+    client.server_process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", FAKE_SERVER,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+    )
+    client._reader_task = asyncio.create_task(client._read_responses(client.server_process))
+
+    def request(params):
+        return client._send_request({"jsonrpc": "2.0", "id": client._next_id(), "method": "echo", "params": params})
+
+    first, second = await asyncio.gather(request({"n": 1}), request({"n": 2}))
+    assert first["result"]["echo"] == {"n": 1}
+    assert second["result"]["echo"] == {"n": 2}
+
+    # The server has exited, so further requests fail instead of hanging
+    await client.server_process.wait()
+    try:
+        await asyncio.wait_for(request({"n": 3}), timeout=5)
+    except (RuntimeError, ConnectionError):
+        pass
+    await client.stop_server()
+
+FAKE_TOOL_SERVER = """
+import json, sys
+requests = [json.loads(sys.stdin.readline()) for _ in range(3)]
+for request in reversed(requests):
+    text = json.dumps({"tool": request["params"]["name"], "arguments": request["params"]["arguments"]})
+    print(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {"content": [{"type": "text", "text": text}]}}), flush=True)
+"""
+
+async def test_call_tools_pipelines_requests():
+    """Test that a burst of tool calls is written before any response is needed"""
+    client = AsyncNutritionMCPClient(transport="subprocess")
+    client.server_process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", FAKE_TOOL_SERVER,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+    )
+    client._reader_task = asyncio.create_task(client._read_responses(client.server_process))
+
+    results = await asyncio.wait_for(client.call_tools([("a", {"n": 1}), ("b", {"n": 2}), ("c", {})]), timeout=10)
+    assert results == [
+        {"tool": "a", "arguments": {"n": 1}},
+        {"tool": "b", "arguments": {"n": 2}},
+        {"tool": "c", "arguments": {}},
+    ]
+    assert client._pending == {}
+    await client.stop_server()
+
+OVERSIZED_SERVER = """
+import json, sys, time
+request = json.loads(sys.stdin.readline())
+print(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {"pad": "x" * 5000}}), flush=True)
+time.sleep(30)
+"""
+
+async def test_oversized_response_fails_connection():
+    """Test that a response over the line limit fails callers instead of hanging them"""
+    client = AsyncNutritionMCPClient(transport="subprocess")
+    client.server_process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", OVERSIZED_SERVER,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=1024,
+    )
+    client._reader_task = asyncio.create_task(client._read_responses(client.server_process))
+
+    with pytest.raises(RuntimeError, match="closed connection"):
+        await asyncio.wait_for(client.call_tool("a", {}), timeout=10)
+    assert not client.is_running()
+    with pytest.raises(RuntimeError, match="closed connection"):
+        await asyncio.wait_for(client.call_tool("b", {}), timeout=10)
+    await client.stop_server()
+
+async def test_inprocess_transport_calls_tools_directly(monkeypatch):
+    """Test that the in-process transport runs tools without spawning a server"""
+    monkeypatch.chdir(project_root)
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", lambda *args, **kwargs: pytest.fail("no subprocess expected"))
+    client = AsyncNutritionMCPClient()
+    await client.start_server()
+    assert client.is_running()
+
+    recipe = Recipe(title="Test", ingredients=[Ingredient(item="coconut milk", qty="200")],
+                    steps=["Mix"], prep_time=1, cook_time=0, servings=1)
+    batch, unknown = await client.call_tools([
+        ("calculate_recipes_nutrition", {"recipes": [{"ingredients": client._to_mcp_ingredients(recipe)}]}),
+        ("no_such_tool", {}),
+    ])
+    assert batch["recipes"][0]["recipe_nutrition"]["calories"] > 0
+    assert unknown["error"] == "Unknown tool: no_such_tool"
+
+    await client.stop_server()
+    assert not client.is_running()
+    with pytest.raises(RuntimeError, match="Server not started"):
+        await client.call_tool("get_database_stats", {})
+
+def test_to_mcp_ingredients_parses_quantities():
+    """Test that leading gram amounts are parsed and anything else defaults to 100g"""
+    quantities = ["200", "150 g", "250g", " 1.5 cups", ".5", "1/2 cup", "a pinch", "", "1.2.3"]
+    recipe = Recipe(title="Test", ingredients=[Ingredient(item=f"item {i}", qty=qty) for i, qty in enumerate(quantities)],
+                    steps=["Mix"], prep_time=1, cook_time=0, servings=1)
+    ingredients = AsyncNutritionMCPClient._to_mcp_ingredients(recipe)
+    assert [i["quantity_grams"] for i in ingredients] == [200.0, 150.0, 250.0, 1.5, 0.5, 100.0, 100.0, 100.0, 100.0]
+    assert ingredients[0] == {"name": "item 0", "quantity_grams": 200.0}
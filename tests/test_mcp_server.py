@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test MCP server tool logic without a stdio transport
+"""
+
+import asyncio
+import shutil
+import sys
+import os
+
+import mcp.types as types
+import orjson
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from database import NutritionDB
+from nutrition_mcp.mcp_server import NutritionMCPServer
+
+@pytest.fixture
+def server(tmp_path):
+    """Server backed by a scratch copy of data/nutrition.json"""
+    db_file = tmp_path / "nutrition.json"
+    shutil.copy(os.path.join(project_root, "data", "nutrition.json"), db_file)
+    nutrition_server = NutritionMCPServer()
+    nutrition_server.nutrition_db = NutritionDB(str(db_file), enable_llm=False)
+    yield nutrition_server
+    nutrition_server.cleanup()
+
+async def test_calculate_recipe_nutrition(server):
+    """Test totals, per-ingredient scaling and misses keep input order"""
+    totals, details = await server._calculate_recipe_nutrition([
+        {"name": "coconut milk", "quantity_grams": 200},
+        {"name": "zzqx qqzx", "quantity_grams": 10},
+        {"name": "lime juice", "quantity_grams": 30},
+    ])
+
+    assert [d["name"] for d in details] == ["coconut milk", "zzqx qqzx", "lime juice"]
+    assert "error" in details[1]
+    assert totals["calories"] > 0
+    assert totals["vitamin_c_mg"] > 0
+    assert totals["fat"] == pytest.approx(details[0]["nutrition"]["fat"] + details[2]["nutrition"]["fat"], abs=0.02)
+
+async def test_ensure_db_opens_once(tmp_path):
+    """Test that concurrent first calls share a single NutritionDB"""
+    db_file = tmp_path / "nutrition.json"
+    shutil.copy(os.path.join(project_root, "data", "nutrition.json"), db_file)
+    nutrition_server = NutritionMCPServer()
+    nutrition_server.db_path = str(db_file)
+
+    async def ensure():
+        await nutrition_server._ensure_db()
+        return nutrition_server.nutrition_db
+
+    dbs = await asyncio.gather(*[ensure() for _ in range(5)])
+    assert all(db is dbs[0] for db in dbs)
+    nutrition_server.cleanup()
+
+async def test_list_tools():
+    """Test that every tool handled by call_tool is advertised"""
+    nutrition_server = NutritionMCPServer()
+    handler = nutrition_server.server.request_handlers[types.ListToolsRequest]
+    result = await handler(types.ListToolsRequest(method="tools/list"))
+    assert [tool.name for tool in result.root.tools] == [
+        "find_ingredient", "get_nutrition_by_id", "search_ingredients", "add_ingredient",
+        "get_high_protein_foods", "get_database_stats", "calculate_recipe_nutrition",
+        "calculate_recipes_nutrition",
+    ]
+
+async def test_calculate_recipe_nutrition_dedupes_lookups(server, monkeypatch):
+    """Test that repeated ingredient names are resolved once"""
+    lookups = []
+    resolve = server._resolve_ingredient
+    monkeypatch.setattr(server, "_resolve_ingredient", lambda name: lookups.append(name) or resolve(name))
+
+    totals, details = await server._calculate_recipe_nutrition([
+        {"name": "coconut milk", "quantity_grams": 100},
+        {"name": " Coconut Milk", "quantity_grams": 50},
+    ])
+
+    assert lookups == ["coconut milk"]
+    assert details[1]["food_id"] == details[0]["food_id"]
+    assert details[1]["nutrition"]["fat"] == pytest.approx(details[0]["nutrition"]["fat"] / 2, abs=0.01)
+
+async def test_calculate_recipes_nutrition_tool(server):
+    """Test that the batch tool returns one result per recipe, in order"""
+    handler = server.server.request_handlers[types.CallToolRequest]
+    request = types.CallToolRequest(method="tools/call", params=types.CallToolRequestParams(
+        name="calculate_recipes_nutrition",
+        arguments={"recipes": [
+            {"ingredients": [{"name": "coconut milk", "quantity_grams": 100}]},
+            {"ingredients": [{"name": "coconut milk", "quantity_grams": 200}]},
+        ]},
+    ))
+    result = await handler(request)
+    recipes = orjson.loads(result.root.content[0].text)["recipes"]
+
+    assert len(recipes) == 2
+    assert recipes[1]["recipe_nutrition"]["fat"] == pytest.approx(2 * recipes[0]["recipe_nutrition"]["fat"], abs=0.02)
+
+async def test_calculate_recipe_nutrition_reuses_resolutions(server, monkeypatch):
+    """Test that ingredients resolved for one recipe are not searched again for the next"""
+    lookups = []
+    resolve = server._resolve_ingredient
+    monkeypatch.setattr(server, "_resolve_ingredient", lambda name: lookups.append(name) or resolve(name))
+
+    first, _ = await server._calculate_recipe_nutrition([{"name": "coconut milk", "quantity_grams": 100},
+                                                         {"name": "zzqx qqzx", "quantity_grams": 10}])
+    second, details = await server._calculate_recipe_nutrition([{"name": "Coconut milk", "quantity_grams": 100},
+                                                                {"name": "zzqx qqzx", "quantity_grams": 10},
+                                                                {"name": "lime juice", "quantity_grams": 30}])
+
+    assert lookups == ["coconut milk", "zzqx qqzx", "lime juice"]
+    assert "error" in details[1]
+    assert second["fat"] == pytest.approx(first["fat"] + details[2]["nutrition"]["fat"], abs=0.02)
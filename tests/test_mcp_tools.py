@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test the shared MCP client manager
+"""
+
+import asyncio
+import sys
+import os
+import weakref
+
+import orjson
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src import mcp_manager, mcp_tools
+from src.mcp_tools import MCPClientManager
+
+class FakeClient:
+    """Stands in for AsyncNutritionMCPClient without spawning a process"""
+
+    started = 0
+
+    def __init__(self):
+        self.running = False
+        self.loop = None
+
+    async def start_server(self):
+        await asyncio.sleep(0.01)
+        FakeClient.started += 1
+        self.running = True
+        self.loop = asyncio.get_running_loop()
+
+    async def call_tool(self, name, args):
+        # A subprocess client's pipes only work on the loop that started it
+        assert asyncio.get_running_loop() is self.loop, "client used from another event loop"
+        return {"tool": name, "args": args}
+
+    async def stop_server(self):
+        self.running = False
+
+    def is_running(self):
+        return self.running
+
+class RecordingClient:
+    """Started client that echoes tool calls and records each round trip's ingredient names"""
+
+    def __init__(self):
+        self.rounds = []
+
+    async def call_tool(self, name, args):
+        return (await self.call_tools([(name, args)]))[0]
+
+    async def call_tools(self, calls):
+        self.rounds.append([args.get("ingredient_name") for _, args in calls])
+        return [{"tool": name, "args": args} for name, args in calls]
+
+@pytest.fixture
+def recording_client(monkeypatch):
+    """Install a RecordingClient as the shared client"""
+    client = RecordingClient()
+    monkeypatch.setattr(MCPClientManager, "_client", client)
+    return client
+
+@pytest.fixture
+def fake_client_class(monkeypatch):
+    """Patch in FakeClient and reset the shared manager state"""
+    FakeClient.started = 0
+    monkeypatch.setattr(mcp_manager, "AsyncNutritionMCPClient", FakeClient)
+    monkeypatch.setattr(MCPClientManager, "_client", None)
+    monkeypatch.setattr(MCPClientManager, "_client_loop", None)
+    monkeypatch.setattr(MCPClientManager, "_sync_client", None)
+    monkeypatch.setattr(MCPClientManager, "_start_locks", weakref.WeakKeyDictionary())
+    return FakeClient
+
+async def test_ensure_client_starts_one_server(fake_client_class):
+    """Test that concurrent callers share a single lazily started server"""
+    clients = await asyncio.gather(*[MCPClientManager.ensure_client() for _ in range(5)])
+    assert all(client is clients[0] for client in clients)
+    assert fake_client_class.started == 1
+
+async def test_ensure_client_restarts_dead_server(fake_client_class):
+    """Test that a server that exited is replaced on next use"""
+    first = await MCPClientManager.ensure_client()
+    first.running = False
+    second = await MCPClientManager.ensure_client()
+    assert second is not first
+    assert fake_client_class.started == 2
+
+    await MCPClientManager.stop_server()
+    assert MCPClientManager._client is None
+
+async def test_sync_tool_calls_share_session_client(fake_client_class):
+    """Test that sync tool calls from a worker thread run on the session's loop with its client"""
+    tools = {tool.name: tool for tool in mcp_tools.get_nutrition_tools()}
+    async with MCPClientManager.session() as client:
+        # LangChain runs sync tools in a worker thread while the caller's loop keeps running
+        result = await asyncio.to_thread(tools["find_ingredient"].invoke, '{"ingredient_name": "potato"}')
+        assert orjson.loads(result) == {"tool": "find_ingredient", "args": {"ingredient_name": "potato", "max_results": 5}}
+
+        assert MCPClientManager._sync_client is None
+        assert MCPClientManager.get_client() is client
+        assert fake_client_class.started == 1
+
+    assert not client.running
+
+async def test_sync_tool_call_on_session_loop_uses_own_client(fake_client_class):
+    """Test that a sync tool call blocking the session's own loop runs on the background loop instead"""
+    tool = mcp_tools.FindIngredientTool()
+    async with MCPClientManager.session() as client:
+        tool.invoke('{"ingredient_name": "potato"}')
+
+        sync_client = MCPClientManager._sync_client
+        assert sync_client is not client
+        assert sync_client.loop is MCPClientManager._sync_loop
+
+    assert MCPClientManager._sync_client is None
+    assert not sync_client.running and not client.running
+
+def test_run_sync_rejects_background_loop(fake_client_class):
+    """Test that run_sync refuses to block the background loop on itself"""
+    async def nested():
+        coro = asyncio.sleep(0)
+        with pytest.raises(RuntimeError, match="deadlock"):
+            MCPClientManager.run_sync(coro)
+        return "done"
+
+    assert MCPClientManager.run_sync(nested()) == "done"
+
+async def test_tools_await_client_on_running_loop(recording_client, monkeypatch):
+    """Test that async tool invocation calls the shared client without a nested asyncio.run"""
+    monkeypatch.setattr(asyncio, "run", lambda coro: pytest.fail("tools should not start a nested event loop"))
+
+    tools = {tool.name: tool for tool in mcp_tools.get_nutrition_tools()}
+    result = await tools["find_ingredient"].ainvoke('{"ingredient_name": "potato", "max_results": 2}')
+    assert orjson.loads(result) == {"tool": "find_ingredient", "args": {"ingredient_name": "potato", "max_results": 2}}
+    result = await tools["calculate_recipe_nutrition"].ainvoke('[{"name": "rice", "quantity_grams": 100}]')
+    assert orjson.loads(result)["args"]["ingredients"] == [{"name": "rice", "quantity_grams": 100}]
+
+async def test_calculate_tool_accepts_input_shapes(recording_client):
+    """Test that recipe nutrition accepts a list, a wrapped list, or a JSON-encoded list"""
+    tool = mcp_tools.CalculateRecipeNutritionTool()
+    ingredients = [{"name": "rice", "quantity_grams": 100}]
+
+    async def sent_ingredients(tool_input):
+        return orjson.loads(await tool._arun(tool_input))["args"]["ingredients"]
+
+    assert await sent_ingredients(ingredients) == ingredients
+    assert await sent_ingredients({"ingredients": ingredients}) == ingredients
+    assert await sent_ingredients('{"ingredients": "[{\\"name\\": \\"rice\\", \\"quantity_grams\\": 100}]"}') == ingredients
+    assert (await tool._arun("not json")).startswith("Error calculating recipe nutrition")
+
+def test_sync_tool_calls_share_background_loop(fake_client_class, monkeypatch):
+    """Test that sync tool invocation reuses one background loop and client instead of asyncio.run per call"""
+    monkeypatch.setattr(asyncio, "run", lambda coro: pytest.fail("tools should not create an event loop per call"))
+
+    tool = mcp_tools.FindIngredientTool()
+    assert orjson.loads(tool.invoke('{"ingredient_name": "potato"}')) == {
+        "tool": "find_ingredient", "args": {"ingredient_name": "potato", "max_results": 5}}
+    client = MCPClientManager._sync_client
+    tool.invoke('{"ingredient_name": "onion", "max_results": 1}')
+
+    assert MCPClientManager._sync_client is client
+    assert client.loop is MCPClientManager._sync_loop
+    assert fake_client_class.started == 1
+
+def test_nutrition_does_not_import_langchain():
+    """Test that the nutrition path only needs the client manager, not the LangChain tools"""
+    import subprocess
+
+    code = "import sys, src.nutrition; print('langchain' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+async def test_batch_lookup_and_tool_call_memo(recording_client):
+    """Test that batch lookups use one round trip and repeated calls in a memo block are reused"""
+    client = recording_client
+    find = mcp_tools.FindIngredientTool()
+    find_many = mcp_tools.FindIngredientsBatchTool()
+
+    with mcp_tools.tool_call_memo():
+        await find._arun('{"ingredient_name": "potato", "max_results": 3}')
+        result = await find_many._arun('{"ingredient_names": ["potato", "onion", "leek"], "max_results": 3}')
+        await find._arun('{"max_results": 3, "ingredient_name": "leek"}')
+
+    assert client.rounds == [["potato"], ["onion", "leek"]]
+    assert orjson.loads(result) == {
+        name: {"tool": "find_ingredient", "args": {"ingredient_name": name, "max_results": 3}} for name in ["potato", "onion", "leek"]}
+
+    # Outside a memo block every call reaches the server
+    await find._arun('{"ingredient_name": "potato", "max_results": 3}')
+    assert client.rounds[-1] == ["potato"]
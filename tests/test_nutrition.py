@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test nutrition calculation caching
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src import nutrition
+from src.models import Recipe, Ingredient
+from utils.disk_cache import DiskCache
+
+class FakeClient:
+    """Stands in for the MCP client and counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.batches = []
+
+    async def calculate_recipes_nutrition(self, recipes):
+        self.calls += 1
+        self.batches.append([recipe.title for recipe in recipes])
+        return {"recipes": [
+            {"recipe_nutrition": {"calories": 60.0 * len(recipe.ingredients[0].qty), "protein": 3.0, "fat": 8.0, "carbs": 10.0}}
+            for recipe in recipes
+        ]}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Fake MCP client with fresh nutrition caches"""
+    fake_client = FakeClient()
+    async def ensure_client(cls):
+        return fake_client
+    monkeypatch.setattr(nutrition.MCPClientManager, "ensure_client", classmethod(ensure_client))
+    monkeypatch.setattr(nutrition, "_memory_cache", {})
+    monkeypatch.setattr(nutrition, "_disk_cache", DiskCache(str(tmp_path / "cache")))
+    return fake_client
+
+def make_recipe(title, qty="200"):
+    return Recipe(title=title, ingredients=[Ingredient(item="coconut milk", qty=qty)],
+                  steps=["Serve"], prep_time=5, cook_time=0, servings=2)
+
+async def test_compute_nutrition_cached_by_ingredients(client):
+    """Test that recipes with the same ingredients reuse the first result"""
+    first = await nutrition.compute_nutrition(make_recipe("Curry"))
+    second = await nutrition.compute_nutrition(make_recipe("Renamed curry"))
+    assert client.calls == 1
+    assert second == first
+
+    second.macros['fat'] = 0.0
+    assert (await nutrition.compute_nutrition(make_recipe("Curry"))).macros['fat'] == 8.0
+
+    await nutrition.compute_nutrition(make_recipe("Curry", qty="300"))
+    assert client.calls == 2
+
+def test_nutrition_cache_key_canonical():
+    """Test that ingredient order, case and padding don't change the cache key"""
+    recipe = Recipe(title="Stew", ingredients=[Ingredient(item="Carrot", qty="100g"), Ingredient(item="onion ", qty="50g")],
+                    steps=["Simmer"], prep_time=5, cook_time=30, servings=2)
+    reordered = Recipe(title="Stew", ingredients=[Ingredient(item="onion", qty="50g"), Ingredient(item="carrot", qty=" 100g")],
+                       steps=["Simmer"], prep_time=5, cook_time=30, servings=2)
+    assert nutrition._nutrition_cache_key(recipe) == nutrition._nutrition_cache_key(reordered)
+    assert nutrition._nutrition_cache_key(recipe) != nutrition._nutrition_cache_key(make_recipe("Stew"))
+
+async def test_memory_cache_evicts_least_recently_used(client, monkeypatch):
+    """Test that a cache hit protects an entry from eviction"""
+    monkeypatch.setattr(nutrition, "NUTRITION_MEMORY_CACHE_SIZE", 2)
+    first, second = make_recipe("A", qty="1"), make_recipe("B", qty="22")
+    await nutrition.compute_nutrition(first)
+    await nutrition.compute_nutrition(second)
+    await nutrition.compute_nutrition(first)
+    await nutrition.compute_nutrition(make_recipe("C", qty="333"))
+    assert list(nutrition._memory_cache) == [nutrition._nutrition_cache_key(r) for r in (first, make_recipe("C", qty="333"))]
+
+async def test_compute_nutrition_disk_cache(client, monkeypatch):
+    """Test that a fresh process-local cache falls back to the disk cache"""
+    await nutrition.compute_nutrition(make_recipe("Curry"))
+    monkeypatch.setattr(nutrition, "_memory_cache", {})
+    assert (await nutrition.compute_nutrition(make_recipe("Curry"))).calories == 180.0
+    assert client.calls == 1
+
+async def test_compute_nutrition_without_disk_cache(client, monkeypatch):
+    """Test that an unset cache directory keeps results in memory only"""
+    monkeypatch.setattr(nutrition, "_disk_cache", None)
+    await nutrition.compute_nutrition(make_recipe("Curry"))
+    monkeypatch.setattr(nutrition, "_memory_cache", {})
+    await nutrition.compute_nutrition(make_recipe("Curry"))
+    assert client.calls == 2
+
+async def test_compute_nutrition_profile_fields(client):
+    """Test that the profile maps server totals to macros and micros"""
+    profile = await nutrition.compute_nutrition(make_recipe("Curry"))
+    assert profile.macros == {"protein": 3.0, "fat": 8.0, "carbs": 10.0}
+    assert profile.micros["iron_mg"] == 0.0
+    assert nutrition.NutritionProfile.model_validate_json(profile.model_dump_json()) == profile
+
+async def test_compute_nutrition_batch(client):
+    """Test that uncached recipes go to the server in one call, deduplicated, in order"""
+    await nutrition.compute_nutrition(make_recipe("Cached"))
+    profiles = await nutrition.compute_nutrition_batch([
+        make_recipe("Small", qty="20"), make_recipe("Cached"), make_recipe("Small again", qty="20"), make_recipe("Large", qty="2000"),
+    ])
+
+    assert client.batches == [["Cached"], ["Small", "Large"]]
+    assert [profile.calories for profile in profiles] == [120.0, 180.0, 120.0, 240.0]
+    assert profiles[0] is not profiles[2]
+
+async def test_compute_nutrition_many(client):
+    """Test that recipes are split into batches and results keep input order"""
+    recipes = [make_recipe(f"Recipe {i}", qty="1" * (i + 1)) for i in range(7)]
+    profiles = await nutrition.compute_nutrition_many(recipes, batch_size=3, max_concurrency=2)
+
+    assert sorted(len(batch) for batch in client.batches) == [1, 3, 3]
+    assert [profile.calories for profile in profiles] == [60.0 * (i + 1) for i in range(7)]
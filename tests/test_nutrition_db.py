@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test NutritionDB queries against a copy of the nutrition database
+"""
+
+import shutil
+import sys
+import os
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from database import NutritionDB
+
+@pytest.fixture
+def db(tmp_path):
+    """NutritionDB over a scratch copy of data/nutrition.json"""
+    db_file = tmp_path / "nutrition.json"
+    shutil.copy(os.path.join(project_root, "data", "nutrition.json"), db_file)
+    with NutritionDB(str(db_file), enable_llm=False) as nutrition_db:
+        yield nutrition_db
+
+def test_get_food_by_id(db):
+    """Test lookup by food_id for existing and missing ids"""
+    food = db.db.all()[0]
+    assert db.get_food_by_id(food['food_id'])['description'] == food['description']
+    assert db.get_food_by_id("does_not_exist") is None
+
+def test_get_food_by_id_returns_copy_from_memory(db, monkeypatch):
+    """Test that lookups are served from memory and don't share state with the cache"""
+    food_id = db.db.all()[0]['food_id']
+    monkeypatch.setattr(db.db, "get", lambda *args, **kwargs: pytest.fail("read the database file"))
+    food = db.get_food_by_id(food_id)
+    food['description'] = "changed"
+    assert db.get_food_by_id(food_id)['description'] != "changed"
+    assert db.get_food_by_id(food_id).doc_id == food.doc_id
+
+def test_add_food_and_update_usage(db):
+    """Test that added foods are immediately retrievable and usage is tracked"""
+    food_id = db.add_food("Test dragonfruit", {"calories": 60.0, "protein": 1.2})
+
+    food = db.get_food_by_id(food_id)
+    assert food['description'] == "Test dragonfruit"
+    assert food['source'] == "llm_estimate"
+
+    assert db.update_food_usage(food_id)
+    assert db.update_food_usage(food_id)
+    assert db.get_food_by_id(food_id)['usage_count'] == 2
+    assert not db.update_food_usage("does_not_exist")
+
+def test_search_and_find_ingredient(db):
+    """Test substring search, exact and fuzzy ingredient matching"""
+    results = db.search_by_description("COCONUT")
+    assert results
+    assert all("coconut" in food['description'].lower() for food in results)
+
+    exact = db.find_ingredient("coconut", max_results=2)
+    assert 0 < len(exact) <= 2
+    assert all(match['match_score'] == 1.0 for match in exact)
+    assert all('match_score' not in food for food in db.search_by_description("coconut"))
+
+    fuzzy = db.find_ingredient("milk coconut")
+    assert fuzzy
+    assert fuzzy[0]['match_score'] < 1.0
+    assert "coconut" in fuzzy[0]['description'].lower()
+
+def test_search_results_are_copies(db):
+    """Test that modifying search results leaves the database untouched"""
+    result = db.search_by_description("coconut")[0]
+    description = result['description']
+    result['description'] = "changed"
+    assert db.search_by_description("coconut")[0]['description'] == description
+    assert db.find_ingredient(description)[0]['description'] == description
+
+def test_listing_results_are_copies(db):
+    """Test that modifying foods returned by the listing queries leaves the database untouched"""
+    for results in (db.get_foods_with_serving_sizes(), db.get_high_protein_foods(0.0), db.get_foods_by_source("usda")):
+        assert results
+        food_id = results[0]['food_id']
+        results[0]['protein'] = -1.0
+        assert db.get_food_by_id(food_id).get('protein') != -1.0
+    assert all(food['protein'] >= 20.0 for food in db.get_high_protein_foods())
+
+def test_added_food_is_searchable(db):
+    """Test that added foods show up in searches and counts"""
+    total = db.count_foods()
+    db.add_food("Test dragonfruit", {"calories": 60.0})
+    assert db.count_foods() == total + 1
+    assert db.find_ingredient("test dragonfruit")[0]['description'] == "Test dragonfruit"
+
+async def test_find_or_create_ingredients_batches_misses(db):
+    """Test that only database misses are sent to the LLM, in one batch"""
+    class FakeEstimator:
+        def __init__(self):
+            self.batches = []
+
+        async def get_nutrition_estimates_batch(self, names):
+            self.batches.append(names)
+            return [{"calories": 40.0, "protein": 1.0, "fat": 0.0, "carbs": 9.0} for _ in names]
+
+        def validate_nutrition_data(self, nutrition_data):
+            return True
+
+    db.llm_estimator = FakeEstimator()
+
+    writes = []
+    original_insert_multiple = db.db.insert_multiple
+    db.db.insert = lambda doc: pytest.fail("missing foods should be inserted together")
+    db.db.insert_multiple = lambda docs: writes.append(len(docs)) or original_insert_multiple(docs)
+
+    results = await db.find_or_create_ingredients(["coconut", "zzqx fruit", "qqzx root"])
+
+    assert db.llm_estimator.batches == [["zzqx fruit", "qqzx root"]]
+    assert writes == [2]
+    assert "coconut" in results[0]['description'].lower()
+    assert [r['description'] for r in results[1:]] == ["zzqx fruit", "qqzx root"]
+    assert all(r['source'] == "llm_estimate" for r in results[1:])
+
+def test_food_ids_unique_for_same_name(db):
+    """Test that foods added back-to-back with the same name get distinct ids"""
+    first = db.add_food("Green Curry Paste!", {"calories": 100.0})
+    second = db.add_food("Green Curry Paste!", {"calories": 110.0})
+    assert first != second
+    assert first.startswith("green_curry_paste_")
+    assert db.get_food_by_id(second)['calories'] == 110.0
+
+def test_food_ids_unique_across_instances(db, tmp_path):
+    """Test that two databases adding the same food in the same second get distinct ids"""
+    other_file = tmp_path / "other.json"
+    shutil.copy(os.path.join(project_root, "data", "nutrition.json"), other_file)
+    with NutritionDB(str(other_file), enable_llm=False) as other:
+        assert db.add_food("Test kiwano", {"calories": 44.0}) != other.add_food("Test kiwano", {"calories": 44.0})
+
+def test_find_ingredient_cache(db):
+    """Test cached lookups return independent copies and see newly added foods"""
+    first = db.find_ingredient("Coconut")
+    first[0]['description'] = "changed"
+    assert db.find_ingredient("coconut")[0]['description'] != "changed"
+
+    assert db.find_ingredient("zzqx fruit") == []
+    db.add_food("Zzqx fruit", {"calories": 10.0})
+    assert db.find_ingredient("zzqx fruit")[0]['description'] == "Zzqx fruit"
+
+def test_find_or_create_exact_description(db):
+    """Test that an exact description match is returned without LLM estimation"""
+    food = db.db.all()[0]
+    match = db.find_or_create_ingredient(food['description'].upper(), auto_add=False)
+    assert match['food_id'] == food['food_id']
+    assert match['match_score'] == 1.0
+
+def test_database_stats(db):
+    """Test that stats match a direct count over the stored foods"""
+    all_foods = db.db.all()
+    stats = db.get_database_stats()
+    assert stats['total_foods'] == len(all_foods)
+    assert stats['foods_with_serving_sizes'] == sum('serving_sizes' in f for f in all_foods)
+    assert stats['foods_with_protein_data'] == sum('protein' in f for f in all_foods)
+    assert stats['foods_by_source']['usda'] == sum(f.get('source') == 'usda' for f in all_foods)
+
+    db.add_food("Test dragonfruit", {"calories": 60.0, "protein": 1.2})
+    stats_after = db.get_database_stats()
+    assert stats_after['foods_by_source']['llm_estimate'] == stats['foods_by_source']['llm_estimate'] + 1
+    assert stats_after['foods_with_protein_data'] == stats['foods_with_protein_data'] + 1
+
+def test_add_foods(db):
+    """Test that bulk-added foods get unique ids and are indexed"""
+    food_ids = db.add_foods([
+        ("Test kiwano", {"calories": 44.0}, "user_added", 0.9),
+        ("Test kiwano", {"calories": 45.0}, "llm_estimate", 0.7),
+    ])
+    assert len(set(food_ids)) == 2
+    assert [db.get_food_by_id(food_id)['calories'] for food_id in food_ids] == [44.0, 45.0]
+    assert db.get_food_by_id(food_ids[0])['source'] == "user_added"
+    assert len(db.find_ingredient("test kiwano")) == 2
+    assert db.add_foods([]) == []
+
+def test_preload_ingredients_submits_one_batch(db):
+    """Test that preloading sends only new, distinct ingredients in a single batch job"""
+    class FakeEstimator:
+        def __init__(self):
+            self.batches = []
+
+        def get_nutrition_estimates_batch_api(self, names, poll_interval):
+            self.batches.append(names)
+            return [{"calories": 40.0, "protein": 1.0, "fat": 0.0, "carbs": 9.0}, None]
+
+        def validate_nutrition_data(self, nutrition_data):
+            return True
+
+    db.llm_estimator = FakeEstimator()
+
+    assert db.preload_ingredients(["coconut", "zzqx fruit", "qqzx root", "zzqx fruit"]) == 1
+    assert db.llm_estimator.batches == [["zzqx fruit", "qqzx root"]]
+    assert db.find_ingredient("zzqx fruit")[0]['source'] == "llm_estimate"
+    assert db.find_ingredient("qqzx root") == []
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test planner output parsing
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from langchain_core.messages import AIMessage
+
+from src import planner
+from src.models import UserNeeds
+
+class FakeLLM:
+    """Returns a canned chat reply and records the prompt it was given"""
+
+    def __init__(self, content):
+        self.content = content
+        self.prompt = None
+
+    def invoke(self, prompt):
+        self.prompt = prompt
+        return AIMessage(content=self.content)
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+def test_generate_plan_parses_structured_output(monkeypatch):
+    """Test that the schema-constrained reply is parsed into a Plan"""
+    llm = FakeLLM('{"meal": "Pad Thai", "ingredients": [{"item": "rice noodles", "qty": "200g"}], "dietary_needs": null}')
+    monkeypatch.setattr(planner, "get_planner_llm", lambda: llm)
+
+    plan = planner.generate_plan(UserNeeds(cuisine="Thai", max_prep_time=30, dietary_needs="vegan"))
+    assert plan.meal == "Pad Thai"
+    assert plan.dietary_needs is None
+    assert "Cuisine: Thai" in llm.prompt and "Dietary needs: vegan" in llm.prompt
+
+def test_plan_response_format_is_strict():
+    """Test that the strict schema requires every property it declares"""
+    schema = planner.PLAN_RESPONSE_FORMAT["json_schema"]["schema"]
+    assert set(schema["required"]) == set(schema["properties"]) == set(planner.Plan.model_fields)
+    items = schema["properties"]["ingredients"]["items"]
+    assert set(items["required"]) == set(items["properties"])
+
+def test_generate_plan_incomplete_output(monkeypatch):
+    """Test that truncated output is reported as unparseable"""
+    monkeypatch.setattr(planner, "get_planner_llm", lambda: FakeLLM('{"meal": "Pad'))
+    with pytest.raises(ValueError, match="Could not parse JSON"):
+        planner.generate_plan(UserNeeds(cuisine="Thai", max_prep_time=30))
+
+async def test_generate_plan_async(monkeypatch):
+    """Test that the async planner parses the same way as the sync one"""
+    llm = FakeLLM('{"meal": "Dal", "ingredients": [{"item": "lentils", "qty": "200g"}], "dietary_needs": "vegan"}')
+    monkeypatch.setattr(planner, "get_planner_llm", lambda: llm)
+
+    plan = await planner.generate_plan_async(UserNeeds(cuisine="Indian", max_prep_time=30))
+    assert plan.meal == "Dal"
+    assert "Cuisine: Indian" in llm.prompt
+
+def test_planner_llm_reused(monkeypatch):
+    """Test that the bound planner LLM is built once and rebuilt when the shared LLM changes"""
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(api_key="test")
+    monkeypatch.setattr(planner, "get_chat_llm", lambda temperature: llm)
+    monkeypatch.setattr(planner, "_planner_llm", None)
+
+    bound = planner.get_planner_llm()
+    assert planner.get_planner_llm() is bound
+    assert bound.kwargs["max_tokens"] == planner.PLANNER_MAX_TOKENS
+
+    llm = ChatOpenAI(api_key="test")
+    assert planner.get_planner_llm() is not bound
+
+def test_generate_plan_prompt_cache(monkeypatch, tmp_path):
+    """Test that a repeated prompt is answered from the prompt cache but parsed again"""
+    from utils import prompt_cache
+    from utils.disk_cache import DiskCache
+
+    monkeypatch.setattr(prompt_cache, "_prompt_cache", DiskCache(str(tmp_path)))
+    llm = FakeLLM('{"meal": "Dal", "ingredients": [{"item": "lentils", "qty": "200g"}], "dietary_needs": null}')
+    monkeypatch.setattr(planner, "get_planner_llm", lambda: llm)
+    # The cache key is built from plain settings - looking it up must not build a client
+    monkeypatch.setattr(planner, "get_chat_llm", lambda **kwargs: pytest.fail("cache key built an LLM client"))
+
+    needs = UserNeeds(cuisine="Indian", max_prep_time=30, dietary_needs=None)
+    first = planner.generate_plan(needs)
+    llm.content = "not called"
+    second = planner.generate_plan(needs)
+
+    assert second == first
+    assert second is not first
+
+def test_planner_prompt_static_prefix():
+    """Test that user constraints come after the instructions so prompts share a prefix"""
+    thai = planner._format_planner_prompt(UserNeeds(cuisine="Thai", max_prep_time=30, dietary_needs="vegan"))
+    indian = planner._format_planner_prompt(UserNeeds(cuisine="Indian", max_prep_time=45))
+
+    shared = os.path.commonprefix([thai, indian])
+    assert shared.endswith("- Cuisine: ")
+    assert "output only that one JSON" in shared
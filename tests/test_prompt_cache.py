@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the exact-match prompt output cache
+"""
+
+import sys
+import os
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils import prompt_cache
+from utils.disk_cache import DiskCache
+
+SETTINGS = ("gpt-4o-mini", 0.5)
+
+def test_prompt_cache_disabled_by_default(monkeypatch):
+    """Test that every call reaches the LLM when no cache directory is configured"""
+    monkeypatch.setattr(prompt_cache, "_prompt_cache", None)
+    calls = []
+
+    @prompt_cache.prompt_cache(lambda text: text, lambda text: SETTINGS)
+    def call_llm(text):
+        calls.append(text)
+        return "reply"
+
+    call_llm("hello")
+    call_llm("hello")
+    assert calls == ["hello", "hello"]
+
+def test_prompt_cache_by_rendered_prompt(monkeypatch, tmp_path):
+    """Test that identical prompts hit the cache and None results are not stored"""
+    monkeypatch.setattr(prompt_cache, "_prompt_cache", DiskCache(str(tmp_path)))
+    calls = []
+
+    @prompt_cache.prompt_cache(lambda text: f"prompt: {text}", lambda text: SETTINGS)
+    def call_llm(text):
+        calls.append(text)
+        return None if text == "refuse" else f"reply to {text}"
+
+    assert call_llm("a") == "reply to a"
+    assert call_llm("a") == "reply to a"
+    assert call_llm("b") == "reply to b"
+    assert call_llm("refuse") is None
+    assert call_llm("refuse") is None
+    assert calls == ["a", "b", "refuse", "refuse"]
+
+def test_prompt_cache_keyed_by_model_settings(monkeypatch, tmp_path):
+    """Test that the same prompt sent at another temperature or to another model is not a hit"""
+    monkeypatch.setattr(prompt_cache, "_prompt_cache", DiskCache(str(tmp_path)))
+    llms = {"low": ("gpt-4o-mini", 0.2), "high": ("gpt-4o-mini", 0.8), "other": ("gpt-4o", 0.2)}
+    calls = []
+
+    @prompt_cache.prompt_cache(lambda text, llm: text, lambda text, llm: llms[llm])
+    def call_llm(text, llm):
+        calls.append(llm)
+        return f"{llm} reply"
+
+    assert [call_llm("a", llm) for llm in ["low", "high", "other", "low"]] == [
+        "low reply", "high reply", "other reply", "low reply"]
+    assert calls == ["low", "high", "other"]
+
+async def test_prompt_cache_async(monkeypatch, tmp_path):
+    """Test that async functions share the same cache entries"""
+    monkeypatch.setattr(prompt_cache, "_prompt_cache", DiskCache(str(tmp_path)))
+    calls = []
+
+    @prompt_cache.prompt_cache(lambda text: text, lambda text: SETTINGS)
+    def call_llm(text):
+        return "sync reply"
+
+    @prompt_cache.prompt_cache(lambda text: text, lambda text: SETTINGS)
+    async def call_llm_async(text):
+        calls.append(text)
+        return "async reply"
+
+    assert call_llm("hello") == "sync reply"
+    assert await call_llm_async("hello") == "sync reply"
+    assert await call_llm_async("other") == "async reply"
+    assert calls == ["other"]
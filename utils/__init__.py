@@ -3,5 +3,6 @@ Utility functions for the nutrition database
 """
 
 from .fuzzy_match import FuzzyMatcher
+from .json_extract import extract_first_json_object
 
-__all__ = ['FuzzyMatcher']
\ No newline at end of file
+__all__ = ['FuzzyMatcher', 'extract_first_json_object']
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Persistent key/value cache for LLM outputs
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+# Expired entries are swept on write, at most this often per cache instance
+PRUNE_INTERVAL = 60  # seconds
+
+# Temp files older than this belong to a writer that died mid-write
+STALE_TMP_AGE = 3600  # seconds
+
+class DiskCache:
+    """
+    File-backed string cache storing one JSON file per key
+    """
+
+    def __init__(self, directory: str, max_entries: int = 10000):
+        """
+        Initialize disk cache
+
+        Args:
+            directory: Directory holding cache entries (created on first write)
+            max_entries: Entries kept after a prune; the least recently written go first
+        """
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self._last_prune = 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached value
+
+        Args:
+            key: Cache key (e.g. a hex digest)
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and expires_at < time.time():
+            path.unlink(missing_ok=True)
+            return None
+
+        return entry.get('value')
+
+    def set(self, key: str, value: str, expire: Optional[float] = None) -> None:
+        """
+        Store a value in the cache
+
+        Args:
+            key: Cache key (e.g. a hex digest)
+            value: String value to store
+            expire: Seconds until the entry expires, or None to keep it forever
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = {
+            'value': value,
+            'expires_at': time.time() + expire if expire is not None else None
+        }
+
+        # Write to a temp file and rename so readers never see a partial entry.
+        # Each writer gets its own temp file, so concurrent writes of one key don't collide
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, suffix='.tmp', delete=False) as f:
+            json.dump(entry, f)
+        try:
+            os.replace(f.name, path)
+        except OSError:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+        now = time.time()
+        if now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete expired entries, then the oldest ones beyond max_entries
+
+        Returns:
+            Number of entries deleted
+        """
+        now = time.time()
+        removed = 0
+        live = []
+        for path in self.directory.glob('*.json'):
+            try:
+                with open(path, 'r') as f:
+                    expires_at = json.load(f).get('expires_at')
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            except (OSError, json.JSONDecodeError, AttributeError):
+                expires_at = now - 1
+                mtime = now
+            if expires_at is not None and expires_at < now:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                live.append((mtime, path))
+
+        if len(live) > self.max_entries:
+            live.sort()
+            for _, path in live[:len(live) - self.max_entries]:
+                path.unlink(missing_ok=True)
+                removed += 1
+
+        for tmp_path in self.directory.glob('*.tmp'):
+            try:
+                if now - tmp_path.stat().st_mtime > STALE_TMP_AGE:
+                    tmp_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+        return removed
+
+    def _path(self, key: str) -> Path:
+        """Get file path for a cache key"""
+        return self.directory / f"{key}.json"
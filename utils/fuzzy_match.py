@@ -2,8 +2,91 @@
 Fuzzy matching utilities for ingredient name matching
 """
 
-from typing import List, Dict, Any
-from difflib import SequenceMatcher
+import heapq
+import threading
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Tuple
+
+from rapidfuzz import fuzz, process
+
+# Common noise words that don't help with ingredient identification
+NOISE_WORDS = frozenset([
+    'raw', 'cooked', 'fresh', 'canned', 'frozen', 'dried',
+    'with', 'without', 'added', 'no', 'low', 'high', 'organic',
+    'prepared', 'liquid', 'expressed', 'from', 'grated', 'meat'
+])
+
+# Punctuation that might interfere with matching, mapped to spaces in one pass
+_PUNCT_TABLE = str.maketrans(',()', '   ')
+
+# Food descriptions are normalized again for every query they are scored against
+NORMALIZE_CACHE_SIZE = 8192
+
+# Share of the match score from direct string similarity; word-level scores make up the rest
+STRING_SIMILARITY_WEIGHT = 0.3
+
+def string_similarity(a: str, b: str) -> float:
+    """
+    Normalized edit similarity between two strings
+    
+    Args:
+        a: First string
+        b: Second string
+        
+    Returns:
+        Similarity between 0.0 and 1.0
+    """
+    # Indel similarity, computed in C++
+    return fuzz.ratio(a, b) / 100.0
+
+def string_similarities(query: str, choices: List[str], score_cutoff: float = 0.0) -> List[float]:
+    """
+    Normalized edit similarity between a query and each of several strings
+    
+    Args:
+        query: String to compare
+        choices: Strings to compare it against
+        score_cutoff: Similarities below this may be reported as 0.0
+        
+    Returns:
+        Similarities between 0.0 and 1.0, parallel to choices
+    """
+    # One C++ call scores every choice, preprocessing the query only once. With a
+    # cutoff, rapidfuzz abandons a choice as soon as it can't reach it
+    similarities = [0.0] * len(choices)
+    matches = process.extract(query, choices, scorer=fuzz.ratio, limit=None, score_cutoff=score_cutoff * 100)
+    for _, score, index in matches:
+        similarities[index] = score / 100.0
+    return similarities
+
+class NormalizedText(NamedTuple):
+    """A string normalized for matching, with its words split out"""
+    text: str
+    words: Tuple[str, ...]
+    word_set: FrozenSet[str]
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_text(text: str) -> NormalizedText:
+    """Normalize string for comparison (see FuzzyMatcher._normalize_string)"""
+    # Lowercase, turn punctuation into spaces, then drop noise and one-letter words
+    # (split() also takes care of extra whitespace)
+    filtered_words = tuple(
+        w for w in text.lower().translate(_PUNCT_TABLE).split()
+        if len(w) > 1 and w not in NOISE_WORDS
+    )
+    
+    return NormalizedText(' '.join(filtered_words), filtered_words, frozenset(filtered_words))
+
+class WordQuery(NamedTuple):
+    """Per-ingredient values for word-level scoring, computed once per query"""
+    clean: NormalizedText
+    # Bits of the ingredient words that occur in some food description
+    word_mask: int
+    distinct_count: int
+    # Matching words needed for the key ingredient bonus
+    key_threshold: float
+    # Repeated words each count towards key presence, which the bitmask can't express
+    repeated: bool
 
 class FuzzyMatcher:
     """
@@ -18,6 +101,13 @@ class FuzzyMatcher:
             min_confidence: Minimum confidence score for matches (0.0-1.0)
         """
         self.min_confidence = min_confidence
+        
+        # Food description words -> bit, and normalized description -> bitmask of its
+        # words, so per-food word overlap is one AND and a popcount. Only food words
+        # get bits; the lock keeps concurrent lookups from handing out one bit twice
+        self._word_bits: Dict[str, int] = {}
+        self._food_masks: Dict[str, int] = {}
+        self._vocab_lock = threading.Lock()
     
     def find_best_matches(self, 
                          ingredient: str, 
@@ -34,19 +124,40 @@ class FuzzyMatcher:
         Returns:
             List of foods with match scores, sorted by confidence
         """
-        scored_matches = []
+        ingredient_clean = _normalize_text(ingredient)
+        foods_clean = [_normalize_text(food['description']) for food in food_list]
+        food_masks = [self._food_mask(food_clean) for food_clean in foods_clean]
+        # Built after the food masks, so words first seen in this food list have bits
+        query = self._word_query(ingredient_clean)
         
-        for food in food_list:
-            score = self.calculate_match_score(ingredient, food['description'])
-            
+        # Word-level scores are cheap, so compute them first. String similarity adds
+        # at most STRING_SIMILARITY_WEIGHT, so foods that can't reach min_confidence
+        # even with a perfect string match are dropped before it is computed
+        candidates = []
+        for index, (food_clean, food_mask) in enumerate(zip(foods_clean, food_masks)):
+            word_score = self._word_score(query, food_clean, food_mask)
+            if word_score + STRING_SIMILARITY_WEIGHT >= self.min_confidence:
+                candidates.append((index, food_clean, word_score))
+        if not candidates:
+            return []
+        
+        # Similarity the best remaining candidate needs to reach min_confidence - no
+        # candidate below it can match. Nudged down so float rounding can't drop a tie
+        best_word_score = max(word_score for _, _, word_score in candidates)
+        score_cutoff = max(0.0, (self.min_confidence - best_word_score) / STRING_SIMILARITY_WEIGHT - 1e-9)
+        string_sims = string_similarities(
+            ingredient_clean.text, [food_clean.text for _, food_clean, _ in candidates], score_cutoff=score_cutoff
+        )
+        
+        scored = []
+        for (index, _, word_score), string_sim in zip(candidates, string_sims):
+            score = string_sim * STRING_SIMILARITY_WEIGHT + word_score
             if score >= self.min_confidence:
-                match = food.copy()
-                match['match_score'] = score
-                scored_matches.append(match)
+                scored.append((score, index))
         
-        # Sort by score (highest first) and limit results
-        scored_matches.sort(key=lambda x: x['match_score'], reverse=True)
-        return scored_matches[:limit]
+        # Highest scores first (ties keep list order); only the returned foods are copied
+        best = heapq.nlargest(limit, scored, key=lambda item: item[0])
+        return [{**food_list[index], 'match_score': score} for score, index in best]
     
     def calculate_match_score(self, ingredient: str, food_description: str) -> float:
         """
@@ -60,75 +171,71 @@ class FuzzyMatcher:
             Match score between 0.0 and 1.0
         """
         # Normalize strings
-        ingredient_clean = self._normalize_string(ingredient)
-        food_clean = self._normalize_string(food_description)
-        
-        # Calculate different types of similarity
-        scores = []
+        ingredient_clean = _normalize_text(ingredient)
+        food_clean = _normalize_text(food_description)
         
         # 1. Direct string similarity (30% weight)
-        string_sim = SequenceMatcher(None, ingredient_clean, food_clean).ratio()
-        scores.append(string_sim * 0.3)
-        
-        # 2. Word overlap score (50% weight) - most important
-        word_overlap = self._calculate_word_overlap(ingredient_clean, food_clean)
-        scores.append(word_overlap * 0.5)
-        
-        # 3. Key ingredient presence (20% weight)
-        key_match = self._calculate_key_ingredient_presence(ingredient_clean, food_clean)
-        scores.append(key_match * 0.2)
-        
-        return sum(scores)
+        string_sim = string_similarity(ingredient_clean.text, food_clean.text)
+        food_mask = self._food_mask(food_clean)
+        word_score = self._word_score(self._word_query(ingredient_clean), food_clean, food_mask)
+        return string_sim * STRING_SIMILARITY_WEIGHT + word_score
     
-    def _normalize_string(self, text: str) -> str:
-        """Normalize string for comparison"""
-        # Convert to lowercase and remove extra whitespace
-        text = text.lower().strip()
+    def _food_mask(self, food_clean: NormalizedText) -> int:
+        """Bitmask of a normalized food description's words, assigning bits to new words"""
+        mask = self._food_masks.get(food_clean.text)
+        if mask is not None:
+            return mask
         
-        # Remove punctuation that might interfere with matching
-        text = text.replace(',', ' ').replace('(', ' ').replace(')', ' ')
-        
-        # Remove common noise words that don't help with ingredient identification
-        noise_words = ['raw', 'cooked', 'fresh', 'canned', 'frozen', 'dried', 
-                      'with', 'without', 'added', 'no', 'low', 'high', 'organic',
-                      'prepared', 'liquid', 'expressed', 'from', 'grated', 'meat']
-        
-        words = text.split()
-        filtered_words = [w for w in words if w not in noise_words and len(w) > 1]
-        
-        return ' '.join(filtered_words)
+        with self._vocab_lock:
+            mask = self._food_masks.get(food_clean.text)
+            if mask is None:
+                mask = 0
+                for word in food_clean.word_set:
+                    bit = self._word_bits.get(word)
+                    if bit is None:
+                        bit = self._word_bits[word] = 1 << len(self._word_bits)
+                    mask |= bit
+                self._food_masks[food_clean.text] = mask
+        return mask
     
-    def _calculate_word_overlap(self, ingredient: str, food_description: str) -> float:
-        """Calculate what fraction of ingredient words appear in food description"""
-        ingredient_words = set(ingredient.split())
-        food_words = set(food_description.split())
-        
-        if not ingredient_words:
-            return 0.0
+    def _word_query(self, ingredient_clean: NormalizedText) -> WordQuery:
+        """Precompute the ingredient-only parts of the word score"""
+        # Words no food contains get no bit - they can't overlap anything
+        word_bits = self._word_bits
+        word_mask = 0
+        for word in ingredient_clean.word_set:
+            word_mask |= word_bits.get(word, 0)
         
-        # Count how many ingredient words appear in food description
-        matches = len(ingredient_words & food_words)
-        return matches / len(ingredient_words)
+        word_count = len(ingredient_clean.words)
+        # Single word: it must be present. Two words (e.g. "coconut milk"): both must
+        # be present. Longer: at least 2/3 of the words
+        key_threshold = 1 if word_count == 1 else max(2, word_count * 0.67)
+        return WordQuery(ingredient_clean, word_mask, len(ingredient_clean.word_set), key_threshold,
+                         word_count != len(ingredient_clean.word_set))
     
-    def _calculate_key_ingredient_presence(self, ingredient: str, food_description: str) -> float:
-        """Calculate if key ingredients are present regardless of order"""
-        ingredient_words = ingredient.split()
-        food_words = food_description.split()
+    def _word_score(self, query: WordQuery, food_clean: NormalizedText, food_mask: int) -> float:
+        """Word-level part of the match score for a normalized food description and its word mask"""
+        if not query.distinct_count:
+            return 0.0
         
-        if len(ingredient_words) == 1:
-            # Single word ingredient - direct presence check
-            return 1.0 if ingredient_words[0] in food_words else 0.0
+        # Distinct ingredient words present in the food description
+        shared = (query.word_mask & food_mask).bit_count()
         
-        # Multi-word ingredients - check if most important words are present
-        matches = sum(1 for word in ingredient_words if word in food_words)
+        # 2. Word overlap score (50% weight) - most important
+        word_overlap = shared / query.distinct_count
         
-        # For 2-word ingredients like "coconut milk", both words should be present
-        if len(ingredient_words) == 2:
-            return 1.0 if matches == 2 else 0.0
+        # 3. Key ingredient presence (20% weight) - are the key words present regardless of order
+        if query.repeated:
+            matches = sum(1 for word in query.clean.words if word in food_clean.word_set)
+        else:
+            matches = shared
+        key_match = 1.0 if matches >= query.key_threshold else 0.0
         
-        # For longer ingredients, at least 2/3 of words should match
-        threshold = max(2, len(ingredient_words) * 0.67)
-        return 1.0 if matches >= threshold else 0.0
+        return word_overlap * 0.5 + key_match * 0.2
+    
+    def _normalize_string(self, text: str) -> str:
+        """Normalize string for comparison"""
+        return _normalize_text(text).text
     
     def get_search_variations(self, ingredient: str) -> List[str]:
         """
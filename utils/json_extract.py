@@ -0,0 +1,142 @@
+"""
+JSON extraction utilities for LLM output
+"""
+
+import re
+from typing import Any, List, Optional
+
+import orjson
+
+_STRUCTURAL_CHARS = re.compile(r'[{}"\\]')
+
+
+class IncrementalJsonParser:
+    """
+    Locate the first balanced JSON object in text that arrives in chunks
+
+    Each chunk is scanned once as it is pushed, tracking brace depth and
+    whether we are inside a string literal (including backslash escapes), so
+    braces inside strings and any prose surrounding the object are handled
+    correctly. This lets a caller stop reading a streamed LLM response as
+    soon as the object closes.
+    """
+
+    def __init__(self):
+        """Initialize an empty parser"""
+        self._chunks: List[str] = []
+        self._length = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+
+    def push(self, chunk: str) -> bool:
+        """
+        Feed the next chunk of text
+
+        Args:
+            chunk: Next piece of the text
+
+        Returns:
+            True once the first JSON object is complete
+        """
+        if self._end != -1:
+            return True
+
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        # Until the object starts, skip prose with a fast C-level search
+        begin = 0
+        if self._start == -1:
+            begin = chunk.find('{')
+            if begin == -1:
+                return False
+
+        depth = self._depth
+        in_string = self._in_string
+        escaped_at = self._escaped_at
+
+        # Only braces, quotes and backslashes change state - let the regex
+        # engine skip every other character instead of visiting each in Python
+        for match in _STRUCTURAL_CHARS.finditer(chunk, begin):
+            position = offset + match.start()
+            char = match.group()
+            if escaped_at != -1:
+                skip = position == escaped_at
+                escaped_at = -1
+                if skip:
+                    continue
+            if in_string:
+                if char == '\\':
+                    escaped_at = position + 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                if depth > 0:
+                    in_string = True
+            elif char == '{':
+                if depth == 0:
+                    self._start = position
+                depth += 1
+            elif char == '}' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    self._end = position + 1
+                    break
+
+        # An escape can only carry over to the next chunk if it was the last character
+        if escaped_at != self._length:
+            escaped_at = -1
+
+        self._depth = depth
+        self._in_string = in_string
+        self._escaped_at = escaped_at
+
+        return self._end != -1
+
+    def is_complete(self) -> bool:
+        """Whether the first JSON object has been closed"""
+        return self._end != -1
+
+    def received(self) -> str:
+        """All text pushed so far"""
+        return ''.join(self._chunks)
+
+    def json_text(self) -> Optional[str]:
+        """The first complete JSON object, or None if it hasn't closed yet"""
+        if self._end == -1:
+            return None
+        return self.received()[self._start:self._end]
+
+    def result(self) -> Any:
+        """
+        Decode the first complete JSON object
+
+        Returns:
+            Decoded JSON value
+
+        Raises:
+            ValueError: If no complete object has been seen, or it is not valid JSON
+        """
+        json_text = self.json_text()
+        if json_text is None:
+            raise ValueError("No complete JSON object found")
+        return orjson.loads(json_text)
+
+
+def extract_first_json_object(text: str) -> Optional[str]:
+    """
+    Find the first balanced JSON object in a string
+
+    Args:
+        text: Raw text that may contain a JSON object
+
+    Returns:
+        The substring spanning the first balanced {...} object, or None
+    """
+    parser = IncrementalJsonParser()
+    parser.push(text)
+    return parser.json_text()
@@ -0,0 +1,79 @@
+"""
+Opt-in exact-match cache for raw LLM outputs, keyed by the rendered prompt
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+from typing import Callable, Optional, Tuple
+
+from utils.disk_cache import DiskCache
+
+# Unset by default: most callers sample at high temperature, so replaying a stored
+# output changes behavior. Set it for regression/integration reruns.
+PROMPT_CACHE_DIR = os.environ.get("PROMPT_CACHE_DIR")
+PROMPT_CACHE_TTL = 86400  # seconds
+
+_prompt_cache: Optional[DiskCache] = DiskCache(PROMPT_CACHE_DIR) if PROMPT_CACHE_DIR else None
+
+def prompt_cache_key(prompt_text: str, model: str, temperature: Optional[float]) -> str:
+    """Content hash of a rendered prompt and the model settings it is sent with"""
+    return hashlib.sha256(f"{model}\0{temperature}\0{prompt_text}".encode()).hexdigest()
+
+def _cache_key(render: Callable[..., str], settings: Callable[..., Tuple[str, float]], args, kwargs) -> str:
+    """Cache key for one call of a wrapped function"""
+    model, temperature = settings(*args, **kwargs)
+    return prompt_cache_key(render(*args, **kwargs), model, temperature)
+
+def prompt_cache(render: Callable[..., str], settings: Callable[..., Tuple[str, float]]):
+    """
+    Cache a function's raw string output by the prompt it sends and the model it sends it to
+
+    The wrapped function (sync or async) should only make the LLM call and
+    return its raw text, so parsing and validation still run on every hit.
+    None results are never stored.
+
+    Args:
+        render: Called with the wrapped function's arguments to build the prompt text
+        settings: Called with the same arguments to get the (model name, temperature)
+            the prompt is sent with; both are part of the key
+
+    Returns:
+        Decorator
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Optional[str]:
+                cache = _prompt_cache
+                if cache is None:
+                    return await func(*args, **kwargs)
+
+                key = _cache_key(render, settings, args, kwargs)
+                output = cache.get(key)
+                if output is None:
+                    output = await func(*args, **kwargs)
+                    if output is not None:
+                        cache.set(key, output, expire=PROMPT_CACHE_TTL)
+                return output
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Optional[str]:
+            cache = _prompt_cache
+            if cache is None:
+                return func(*args, **kwargs)
+
+            key = _cache_key(render, settings, args, kwargs)
+            output = cache.get(key)
+            if output is None:
+                output = func(*args, **kwargs)
+                if output is not None:
+                    cache.set(key, output, expire=PROMPT_CACHE_TTL)
+            return output
+
+        return wrapper
+
+    return decorator